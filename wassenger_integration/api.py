@@ -1,25 +1,57 @@
-import frappe
-import requests
 import os
+import time
+from urllib.parse import unquote, urlparse
+
+import frappe
+
+from wassenger_integration.client import get_client
+from wassenger_integration.conversations import upsert_conversations
+from wassenger_integration.dedup import claim_messages, release_messages
+from wassenger_integration.file_cache import (
+    cache_file_ids,
+    get_account_file_cache_key,
+    get_cached_file_ids,
+    get_file_cache_keys,
+    invalidate_file_ids,
+)
+from wassenger_integration.metrics import (
+    METRICS_RETENTION_HOURS,
+    get_post_latency_card,
+    get_queue_stats,
+    get_stage_summary,
+    record_samples,
+    timed,
+)
+from wassenger_integration.outbound import get_retry_delay
+from wassenger_integration.rate_limit import (
+    WassengerRateLimited,
+    get_rate_limiter,
+    get_retry_after,
+)
+from wassenger_integration.routing import assign_devices
+from wassenger_integration.settings import get_settings
+from wassenger_integration.webhooks import buffer_webhook_event, get_delivery_status
+
+MAX_ENQUEUE_MESSAGES = 5000
 
 def get_wassenger_settings():
-    settings = frappe.get_single("Wassenger Settings")
-    return {
-        "api_key": settings.api_key,
-        "allow_send_pdf_attachment": settings.allow_send_pdf_attachment
-    }
-
-def upload_file_to_wassenger(file_url, api_key):
-    url = "https://api.wassenger.com/v1/files"
-    payload = {
-        "url": file_url,
-        "format": "native"
-    }
-    headers = {
-        "content-type": "application/json",
-        "token": api_key
-    }
-    response = requests.post(url, json=payload, headers=headers)
+    """
+    Settings snapshot used by every send path (see `wassenger_integration.settings.get_settings`).
+    """
+    return get_settings()
+
+def upload_file_to_wassenger(file_url, settings, api_key=None, file_path=None):
+    """
+    Upload an attachment and return its Wassenger file ID. With a `file_path` the bytes are
+    streamed from disk ("Direct Upload" mode); otherwise Wassenger downloads `file_url`.
+    """
+    client = get_client(settings, api_key)
+    if file_path:
+        response = client.upload_file_content(file_path)
+    else:
+        response = client.upload_file(file_url)
+    if response.status_code == 429:
+        raise WassengerRateLimited(get_retry_after(response))
     try:
         r = response.json()
     except Exception:
@@ -31,98 +63,444 @@ def upload_file_to_wassenger(file_url, api_key):
     elif isinstance(r, dict) and r.get("status") == 409 and r.get("meta", {}).get("file"):
         return r["meta"]["file"]
     else:
-        frappe.log_error("Wassenger upload error: " + str(r))
+        # No frappe.log_error here: uploads may run in a dispatch thread, the caller logs
         raise Exception("Failed to upload file to WhatsApp: " + str(r))
 
-@frappe.whitelist()
-def send_whatsapp_message(docname: str) -> None:
+
+def get_local_file_path(file_url):
     """
-    Send a WhatsApp message via Wassenger using the details from a 'WH Massage' doc.
-    - If allow_send_pdf_attachment is enabled and the doc has a PDF file:
-        - Uploads the file to Wassenger, then sends it with a text caption (if provided).
-    - Otherwise, sends only the text message.
+    Path on disk of a file stored by Frappe ("/files/..." or "/private/files/..."), or None
+    for anything else (external URLs, print-format links) or a missing file.
     """
-    doc = frappe.get_doc("WH Massage", docname)
+    path = unquote(urlparse(file_url).path)
+    if path.startswith("/private/files/"):
+        folder = frappe.get_site_path("private", "files")
+    elif path.startswith("/files/"):
+        folder = frappe.get_site_path("public", "files")
+    else:
+        return None
 
-    if getattr(doc, "status", None) == "Failed":
-        frappe.msgprint("WhatsApp sending skipped: document marked as Failed due to invalid phone or other reason.")
-        return
+    folder = os.path.realpath(folder)
+    file_path = os.path.realpath(os.path.join(folder, path.split("/files/", 1)[1]))
+    if os.path.dirname(file_path) != folder or not os.path.isfile(file_path):
+        return None
+    return file_path
+
+
+def get_readable_file_urls(file_urls, user):
+    """
+    The subset of `file_urls` that `user` may send: anything not stored as a private file, and
+    private Files they can read (Frappe grants that for Files attached to documents they can read).
+    """
+    private = {file_url for file_url in file_urls if file_url.startswith("/private/")}
+    readable = set(file_urls) - private
+    if private:
+        for file in frappe.get_all("File", filters={"file_url": ["in", list(private)]}, fields=["name", "file_url"]):
+            if file.file_url not in readable and frappe.has_permission("File", "read", doc=file.name, user=user):
+                readable.add(file.file_url)
+    return readable
+
+
+def get_message_payload(doc, settings):
+    """
+    Collect everything needed to deliver a WH Massage (row dict or doc) into a plain dict,
+    resolving the public file URL (and, in "Direct Upload" mode, the file on disk) while we
+    are still in the request/job context.
+    """
+    file_url = None
+    file_path = None
+    if settings.allow_send_pdf_attachment and doc.get("file"):
+        if os.path.basename(doc.file).lower().endswith('.pdf'):
+            file_url = frappe.utils.get_url(doc.file)
+            if settings.file_upload_mode == "Direct Upload":
+                file_path = get_local_file_path(doc.file)
+
+    return frappe._dict({
+        "name": doc.name,
+        "phone": doc.phone,
+        "send_message": doc.get("send_message"),
+        "party_type": doc.get("party_type"),
+        "party": doc.get("party"),
+        "reference_doctype": doc.get("reference_doctype"),
+        "reference_name": doc.get("reference_name"),
+        "dedup_key": doc.get("dedup_key"),
+        "wassenger_message_id": doc.get("wassenger_message_id"),
+        "device": None,
+        "attempts": doc.get("attempts") or 0,
+        "file_url": file_url,
+        "file_path": file_path,
+        "file_cache_key": None,
+        "content_hash": None,
+        "file_id": None,
+    })
 
-    settings = get_wassenger_settings()
-    api_key = settings["api_key"]
-    allow_send_pdf_attachment = settings["allow_send_pdf_attachment"]
 
-    sent = False
+def prepare_messages(docs, settings):
+    """
+    Build delivery payloads for many WH Massage rows/docs, route them to a Wassenger device
+    (see `routing.assign_devices`) and attach any Wassenger file IDs already known for their
+    attachments, so cached files skip the upload round-trip.
+    Private files are only streamed in "Direct Upload" mode if the message's owner may read them;
+    otherwise the message goes out without its attachment.
+    """
+    messages = [get_message_payload(doc, settings) for doc in docs]
+    restrict_private_uploads(messages, docs)
+    assign_devices(messages, settings)
+
+    file_urls = [message.file_url for message in messages if message.file_url]
+    if file_urls:
+        cache_keys = get_file_cache_keys(file_urls)
+        for message in messages:
+            if message.file_url:
+                message.file_cache_key, message.content_hash = cache_keys[message.file_url]
+                if message.device and message.device.api_key != settings.api_key:
+                    # Uploaded files belong to a Wassenger account
+                    message.file_cache_key = get_account_file_cache_key(message.file_cache_key, message.device.api_key)
+        cached_file_ids = get_cached_file_ids([message.file_cache_key for message in messages if message.file_url])
+        for message in messages:
+            if message.file_url:
+                message.file_id = cached_file_ids.get(message.file_cache_key)
+
+    return messages
+
+
+def restrict_private_uploads(messages, docs):
+    """
+    Drop private attachments the owner of their message cannot read (see `prepare_messages`).
+    """
+    uploads_by_owner = {}
+    for message, doc in zip(messages, docs, strict=True):
+        if message.file_path and doc.file.startswith("/private/"):
+            uploads_by_owner.setdefault(doc.owner, []).append((message, doc.file))
+
+    for owner, uploads in uploads_by_owner.items():
+        readable = get_readable_file_urls({file_url for _, file_url in uploads}, owner)
+        for message, file_url in uploads:
+            if file_url not in readable:
+                frappe.log_error(f"WhatsApp attachment {file_url} of {message.name} not sent: {owner} cannot read it")
+                message.file_url = message.file_path = None
+
+
+def post_message(client, data, limiter=None, timings=None):
+    """
+    POST one message, waiting for a slot in the shared rate limiter first.
+    A 429 pauses the limiter for Wassenger's Retry-After and raises WassengerRateLimited.
+    The wait and the POST are timed into `timings` (see `metrics.timed`).
+    """
+    if limiter:
+        with timed("rate_limit_wait", timings):
+            limiter.acquire()
+    with timed("post", timings):
+        resp = client.send_message(data)
+    if resp.status_code == 429:
+        retry_after = get_retry_after(resp)
+        if limiter:
+            limiter.block(retry_after)
+        raise WassengerRateLimited(retry_after)
+    return resp
+
+
+def deliver_message(message, settings, limiter=None):
+    """
+    Deliver one prepared message (see `prepare_messages`) over HTTP.
+    - If the message has a PDF file URL, uploads it (unless its file ID is cached) and sends
+      it with the text as caption. A cached file ID that Wassenger rejects is re-uploaded once.
+    - If that fails, or there is no file, sends only the text message.
+    - If rate limited, the message is left Pending (with `retry_after`) instead of failing.
+    - Network errors and 5xx answers mark the failure as `transient`, so it can be retried.
+    Touches neither the database nor frappe.local, so it is safe to run in a thread pool;
+    the outcome (status, wassenger_message_id, errors) is returned for the caller to persist.
+    """
+    result = frappe._dict({
+        "name": message.name,
+        "device": message.device.device_id if message.device else None,
+        "phone": message.phone,
+        "send_message": message.send_message,
+        "party_type": message.party_type,
+        "party": message.party,
+        "dedup_key": message.dedup_key,
+        "status": "Failed",
+        "wassenger_message_id": None,
+        "with_file": False,
+        "attempts": message.attempts,
+        "retry_after": None,
+        "transient": False,
+        "uploaded_files": {},
+        "stale_file_cache_keys": [],
+        "errors": [],
+        "timings": [],
+    })
+    try:
+        _deliver_message(message, settings, limiter, result)
+    except WassengerRateLimited as e:
+        result.update(status="Pending", retry_after=e.retry_after)
+    return result
+
+
+def _deliver_message(message, settings, limiter, result):
+    api_key = message.device.api_key if message.device else None
+    client = get_client(settings, api_key)
+    device = {"device": message.device.device_id} if message.device else {}
 
     # Step 1: If allowed, try to send file with text
-    if allow_send_pdf_attachment and getattr(doc, "file", None):
-        file_url = frappe.utils.get_url(doc.file)
-        file_name = os.path.basename(doc.file)
-        if file_name.lower().endswith('.pdf'):
-            try:
-                file_id = upload_file_to_wassenger(file_url, api_key)
-                url = "https://api.wassenger.com/v1/messages"
+    if message.file_url:
+        file_id = message.file_id
+        try:
+            for attempt in range(2):
+                if not file_id:
+                    with timed("upload", result.timings):
+                        file_id = upload_file_to_wassenger(message.file_url, settings, api_key, message.file_path)
+                    result.uploaded_files[message.file_cache_key] = {
+                        "file_id": file_id,
+                        "file_url": message.file_url,
+                        "content_hash": message.content_hash,
+                    }
                 data = {
-                    "phone": doc.phone,
-                    "media": {"file": file_id}
+                    "phone": message.phone,
+                    "media": {"file": file_id},
+                    **device,
                 }
-                if getattr(doc, "send_message", None):
-                    data["message"] = doc.send_message  # Text as caption
-                headers = {
-                    "content-type": "application/json",
-                    "token": api_key
-                }
-                resp = requests.post(url, json=data, headers=headers, timeout=15)
+                if message.send_message:
+                    data["message"] = message.send_message  # Text as caption
+                resp = post_message(client, data, limiter, result.timings)
                 if resp.status_code in (200, 201):
-                    message_id = resp.json().get("id")
-                    frappe.db.set_value(doc.doctype, doc.name, {
-                        "wassenger_message_id": message_id,
-                        "status": "Sent"
-                    })
-                    frappe.msgprint("PDF and text sent successfully via WhatsApp.")
-                    sent = True
+                    result.update(status="Sent", wassenger_message_id=resp.json().get("id"), with_file=True)
                     return
-                else:
-                    frappe.log_error(f"Wassenger PDF/text send failed [{docname}]: {resp.status_code} {resp.text}")
-                    frappe.msgprint("Failed to send PDF via WhatsApp (Status {}). Sending only text...".format(resp.status_code))
-            except Exception as e:
-                frappe.log_error(f"Error uploading/sending WhatsApp PDF [{docname}]: {str(e)}")
-                frappe.msgprint("Error sending PDF file. Will attempt plain text message.")
+                result.transient = resp.status_code >= 500 or resp.status_code == 408
+                result.errors.append(f"Wassenger PDF/text send failed [{message.name}]: {resp.status_code} {resp.text}")
+                if attempt or result.uploaded_files or not 400 <= resp.status_code < 500:
+                    break
+                # The cached file ID may have expired on Wassenger's side: upload afresh once
+                result.stale_file_cache_keys.append(message.file_cache_key)
+                file_id = None
+        except WassengerRateLimited:
+            raise
+        except Exception as e:
+            result.transient = True
+            result.errors.append(f"Error uploading/sending WhatsApp PDF [{message.name}]: {e!s}")
 
     # Step 2: If not sent, send only text
-    if not sent and getattr(doc, "send_message", None):
-        url = "https://api.wassenger.com/v1/messages"
+    if message.send_message:
         data = {
-            "phone": doc.phone,
-            "message": doc.send_message
-        }
-        headers = {
-            "content-type": "application/json",
-            "token": api_key
+            "phone": message.phone,
+            "message": message.send_message,
+            **device,
         }
         try:
-            resp = requests.post(url, json=data, headers=headers, timeout=15)
+            resp = post_message(client, data, limiter, result.timings)
             if resp.status_code in (200, 201):
-                message_id = resp.json().get("id")
-                frappe.db.set_value(doc.doctype, doc.name, {
-                    "wassenger_message_id": message_id,
-                    "status": "Sent"
-                })
-                frappe.msgprint("WhatsApp text message sent successfully.")
-                sent = True
+                result.update(status="Sent", wassenger_message_id=resp.json().get("id"))
             else:
-                frappe.db.set_value(doc.doctype, doc.name, "status", "Failed")
-                frappe.log_error(f"Wassenger text send failed [{docname}]: {resp.status_code} {resp.text}")
-                frappe.msgprint("Failed to send WhatsApp text message. See error log.")
+                result.transient = resp.status_code >= 500 or resp.status_code == 408
+                result.errors.append(f"Wassenger text send failed [{message.name}]: {resp.status_code} {resp.text}")
+        except WassengerRateLimited:
+            raise
         except Exception as e:
-            frappe.db.set_value(doc.doctype, doc.name, "status", "Failed")
-            frappe.log_error(f"Error sending WhatsApp text [{docname}]: {str(e)}")
-            frappe.msgprint("Error sending WhatsApp message. See error log.")
+            result.transient = True
+            result.errors.append(f"Error sending WhatsApp text [{message.name}]: {e!s}")
+
+
+def save_delivery_results(results, settings):
+    """
+    Persist the outcome of `deliver_message` calls with one batched UPDATE per chunk,
+    refresh the uploaded-file cache and log any errors collected while sending.
+    Sent messages are threaded into their WhatsApp Conversation, and the stage timings
+    collected while sending are recorded with the time spent here.
+    - Rate-limited messages stay Pending until Wassenger's Retry-After has passed.
+    - Transient failures go to Retrying with a jittered exponential backoff, and to
+      Dead Letter once `max_send_attempts` is reached. Other failures are Failed right away.
+    """
+    start = time.perf_counter()
+    now = frappe.utils.now_datetime()
+    samples = []
+    updates = {}
+    conversation_entries = []
+    uploaded_files = {}
+    stale_file_cache_keys = set()
+    for result in results:
+        uploaded_files.update(result.uploaded_files)
+        stale_file_cache_keys.update(result.stale_file_cache_keys)
+        samples.extend(result.timings)
+
+        update = updates[result.name] = {"status": result.status}
+        if result.wassenger_message_id:
+            update["wassenger_message_id"] = result.wassenger_message_id
+        if result.status == "Sent":
+            update["conversation"] = result.phone
+            if result.device:
+                update["device"] = result.device
+            conversation_entries.append({
+                "phone": result.phone,
+                "direction": "out",
+                "message": result.send_message,
+                "timestamp": str(now),
+                "party_type": result.party_type,
+                "party": result.party,
+                "device": result.device,
+            })
+
+        if result.retry_after:
+            update["next_attempt_at"] = frappe.utils.add_to_date(now, seconds=result.retry_after)
+        elif result.status != "Sent":
+            update["attempts"] = result.attempts + 1
+            update["last_error"] = "\n".join(result.errors)[:1000] or "Nothing to send"
+            if result.transient and update["attempts"] < settings.max_send_attempts:
+                update["status"] = "Retrying"
+                update["next_attempt_at"] = frappe.utils.add_to_date(
+                    now, seconds=get_retry_delay(update["attempts"], settings)
+                )
+            elif result.transient:
+                update["status"] = "Dead Letter"
+
+        for error in result.errors:
+            frappe.log_error(error)
+
+    if conversation_entries:
+        upsert_conversations(conversation_entries)
+    if updates:
+        frappe.db.bulk_update("WH Massage", updates)
+
+    invalidate_file_ids(stale_file_cache_keys)
+    cache_file_ids(uploaded_files, ttl_days=settings.file_cache_ttl_days)
+
+    samples.append(("db_write", time.perf_counter() - start))
+    record_samples(samples)
+
+
+@frappe.whitelist()
+def send_whatsapp_message(docname: str) -> None:
+    """
+    Send a WhatsApp message via Wassenger using the details from a 'WH Massage' doc.
+    - If allow_send_pdf_attachment is enabled and the doc has a PDF file:
+        - Uploads the file to Wassenger, then sends it with a text caption (if provided).
+    - Otherwise, sends only the text message.
+    - Sends at most once: a message already sent (or sent as an identical WH Massage) is
+      not sent again, and a click while the same message is being sent is ignored.
+    """
+    doc = frappe.get_doc("WH Massage", docname)
+
+    if doc.wassenger_message_id:
+        frappe.msgprint("WhatsApp message was already sent.")
+        return
+
+    if getattr(doc, "status", None) in ("Failed", "Dead Letter", "Coalesced", "Duplicate"):
+        frappe.msgprint(f"WhatsApp sending skipped: document marked as {doc.status} due to invalid phone or other reason.")
+        return
+
+    settings = get_wassenger_settings()
+    messages, skipped = claim_messages(prepare_messages([doc], settings), settings)
+    if skipped:
+        frappe.db.bulk_update("WH Massage", skipped)
+        if skipped[doc.name].get("status") == "Duplicate":
+            frappe.msgprint("WhatsApp sending skipped: {}.".format(skipped[doc.name]["last_error"]))
+        else:
+            frappe.msgprint("This WhatsApp message is being sent already.")
+        return
+
+    message = messages[0]
+    result = deliver_message(message, settings, get_rate_limiter(settings, message.device))
+    save_delivery_results([result], settings)
+    release_messages([result])
+
+    if result.retry_after:
+        frappe.msgprint(
+            f"Wassenger rate limit reached. The message stays Pending and will be sent by the queue in about {int(result.retry_after)} seconds."
+        )
+    elif result.status != "Sent":
+        updated_status = frappe.db.get_value(doc.doctype, doc.name, "status")
+        if updated_status == "Retrying":
+            frappe.msgprint("WhatsApp message could not be sent right now. It will be retried automatically.")
+        else:
+            frappe.msgprint("WhatsApp message could not be sent. See error log.")
+    elif result.with_file:
+        frappe.msgprint("PDF and text sent successfully via WhatsApp.")
+    else:
+        frappe.msgprint("WhatsApp text message sent successfully.")
+
+
+@frappe.whitelist()
+def send_pending_messages(limit: int = 500, concurrency: int | None = None) -> dict:
+    """
+    Send up to `limit` pending outbound WH Massage rows now, `concurrency` at a time.
+    Intended for bulk runs (e.g. month-end invoicing); the background queue uses the same path.
+    """
+    frappe.has_permission("WH Massage", "write", throw=True)
+
+    from wassenger_integration.outbound import send_pending_messages as _send_pending_messages
+
+    summary = _send_pending_messages(limit=frappe.utils.cint(limit), concurrency=frappe.utils.cint(concurrency))
+    if summary is None:
+        return {"message": "Another run is already sending pending WhatsApp messages."}
+    return summary
+
+
+@frappe.whitelist(methods=["POST"])
+def enqueue_messages(messages: list | str) -> dict:
+    """
+    Queue many outbound WhatsApp messages in one request and return their WH Massage names
+    right away; they are sent by the background outbound queue.
+    `messages` is a list (or JSON string) of `{"phone", "message", "file", "reference_doctype",
+    "reference_name", "party_type", "party"}` objects; only `phone` and one of `message`/`file`
+    are required. Returns `{"names": [...], "errors": [{"index", "error"}]}` where `names` is
+    aligned with `messages` and holds None for rejected entries. Files the caller cannot read
+    are rejected.
+    """
+    frappe.has_permission("WH Massage", "submit", throw=True)
+
+    messages = frappe.parse_json(messages)
+    if not isinstance(messages, list):
+        frappe.throw("messages must be a list.")
+    if len(messages) > MAX_ENQUEUE_MESSAGES:
+        frappe.throw(f"At most {MAX_ENQUEUE_MESSAGES} messages can be queued per request.")
+
+    from wassenger_integration.outbound import enqueue_outbound_queue, insert_outbound_messages
+
+    names, errors = insert_outbound_messages(messages, get_wassenger_settings(), caller=frappe.session.user)
+    if any(names):
+        enqueue_outbound_queue()
+    return {"names": names, "errors": errors}
+
+
+@frappe.whitelist()
+def retry_message(docname: str) -> None:
+    """
+    Put a Failed or Dead Letter WH Massage back in the outbound queue with a fresh attempt count.
+    """
+    doc = frappe.get_doc("WH Massage", docname)
+    doc.check_permission("write")
+    if doc.docstatus != 1 or doc.type != "out" or doc.status not in ("Failed", "Dead Letter", "Retrying"):
+        frappe.throw("Only submitted outbound messages that failed can be retried.")
+
+    frappe.db.set_value(doc.doctype, doc.name, {
+        "status": "Pending",
+        "attempts": 0,
+        "next_attempt_at": None,
+        "last_error": None,
+    })
+
+    from wassenger_integration.outbound import enqueue_outbound_queue
+    enqueue_outbound_queue()
+
+
+@frappe.whitelist()
+def get_send_metrics(hours: int = 1) -> dict:
+    """
+    Send-path latency per stage (count, average and p50/p90/p99 in ms) over the last `hours`
+    hours, with the outbound queue depth, message counts per status and buffered webhooks.
+    """
+    frappe.has_permission("WH Massage", "read", throw=True)
+    hours = min(max(frappe.utils.cint(hours), 1), METRICS_RETENTION_HOURS)
+    return {"hours": hours, "stages": get_stage_summary(hours), **get_queue_stats(hours)}
+
+
+@frappe.whitelist()
+def get_send_latency_card(filters=None) -> dict:
+    """
+    Value of the "WhatsApp Send Latency p90" number card.
+    """
+    frappe.has_permission("WH Massage", "read", throw=True)
+    return get_post_latency_card(filters)
 
-    if not sent:
-        frappe.db.set_value(doc.doctype, doc.name, "status", "Failed")
-        frappe.msgprint("WhatsApp message could not be sent. See error log.")
-        
 
 @frappe.whitelist(allow_guest=True)
 def wassenger_webhook():
@@ -143,12 +521,14 @@ def wassenger_webhook():
         if not message_id or not status:
             return "Missing message id or status"
 
-        wh_massage = frappe.get_all("WH Massage", filters={"wassenger_message_id": message_id}, fields=["name"])
-        if wh_massage:
-            frappe.db.set_value("WH Massage", wh_massage[0].name, "status", status.capitalize())
-            frappe.db.commit()
-            return "OK"
-        return "Message not found"
+        delivery_status = get_delivery_status(status)
+        if delivery_status:
+            buffer_webhook_event(
+                "status",
+                {"message_id": message_id, "status": delivery_status},
+                dedupe_key=f"{message_id}:{delivery_status}",
+            )
+        return "OK"
     return "Invalid method"
 
 
@@ -156,6 +536,7 @@ def wassenger_webhook():
 def whatsapp_reply():
     """
     Receives inbound WhatsApp messages from Wassenger and inserts as inbound message in ERP.
+    The payload is validated and buffered; the webhook consumer inserts messages in batches.
     """
     data = frappe.request.get_json()
     if not data:
@@ -171,39 +552,34 @@ def whatsapp_reply():
 
     # Prepare fields from webhook payload
     message_id = data_block.get("id")
-    phone_from = data_block.get("fromNumber")
-    phone_to = data_block.get("toNumber")
-    body = data_block.get("body")
-    timestamp = data_block.get("timestamp")
-    contact = data_block.get("chat", {}).get("contact", {})
-    contact_name = contact.get("displayName") or contact.get("name")
-    contact_phone = contact.get("phone")
-    wa_status = data_block.get("status")
-    ack = data_block.get("ack")
-    event_type = data.get("event")
-
-    # Optionally, fetch more fields as needed for your DocType
-
-    # Insert inbound message as 'type = "in"'
-    doc = frappe.get_doc({
-        "doctype": "WH Massage",     # Use your actual DocType name
-        "wassenger_message_id": message_id,
-        "type": "in",
-        "phone": phone_from,
-        "send_message": body,
-        "status": wa_status
-    })
-    doc.insert(ignore_permissions=True)
-    frappe.db.commit()
+    if not message_id:
+        frappe.local.response.http_status_code = 400
+        return {"error": "Missing 'data.id' in payload"}
 
-    return {"message": "Inbound WhatsApp message saved", "docname": doc.name}
+    # Stored as an inbound message ('type = "in"') by the webhook consumer
+    chat = data_block.get("chat") or {}
+    contact = chat.get("contact") or {}
+    buffer_webhook_event("reply", {
+        "message_id": message_id,
+        "phone": data_block.get("fromNumber"),
+        "to_number": data_block.get("toNumber"),
+        "body": data_block.get("body"),
+        "status": data_block.get("status"),
+        "timestamp": data_block.get("timestamp"),
+        "chat_id": chat.get("id"),
+        "contact_name": contact.get("displayName") or contact.get("name"),
+    }, dedupe_key=f"{message_id}:in")
+
+    return {"message": "Inbound WhatsApp message received"}
 
 
 @frappe.whitelist(allow_guest=True)
 def whatsapp_status_update():
     """
     Receives WhatsApp message status updates from Wassenger and updates WH Massage status in ERP.
-    Uses the exact 'ack' value from 'data.ack' in the webhook payload.
+    Uses the 'ack' value from 'data.ack' in the webhook payload, normalized to a delivery status.
+    The event is buffered and applied in batches by the webhook consumer; duplicate, stale or
+    out-of-order acks (e.g. 'sent' after 'read') are no-ops.
     """
     data = frappe.request.get_json()
     if not data:
@@ -218,21 +594,14 @@ def whatsapp_status_update():
         frappe.local.response.http_status_code = 400
         return {"error": "Missing 'id' or 'data.ack' in payload"}
 
-    # Find WH Massage with corresponding wassenger_message_id
-    wh_massage = frappe.get_all(
-        "WH Massage",
-        filters={"wassenger_message_id": message_id},
-        fields=["name"]
-    )
-
-    if not wh_massage:
-        frappe.local.response.http_status_code = 404
-        return {"error": f"No WH Massage found with wassenger_message_id '{message_id}'"}
+    delivery_status = get_delivery_status(ack)
+    if not delivery_status:
+        return {"message": f"Ignored unknown ack '{ack}' for message {message_id}"}
 
-    # Directly set status to the exact ack value from data
-    doc = frappe.get_doc("WH Massage", wh_massage[0].name)
-    doc.status = ack
-    doc.save(ignore_permissions=True)
-    frappe.db.commit()
+    buffer_webhook_event(
+        "status",
+        {"message_id": message_id, "status": delivery_status},
+        dedupe_key=f"{message_id}:{delivery_status}",
+    )
 
-    return {"message": f"Status for message {message_id} updated to {ack}"}
\ No newline at end of file
+    return {"message": f"Status update for message {message_id} to {delivery_status} received"}
@@ -0,0 +1,72 @@
+import frappe
+
+from wassenger_integration.settings import get_settings
+
+CHUNK_SIZE = 1000
+MAX_CHUNKS_PER_RUN = 200
+# Messages in these states may still be sent or updated, so they stay in the live table
+ACTIVE_STATUSES = ("Pending", "Retrying")
+ARCHIVED_FIELDS = (
+    "type", "phone", "status", "send_message", "file", "wassenger_message_id", "message_timestamp",
+    "attempts", "last_error", "reference_doctype", "reference_name", "party_type", "party",
+    "conversation", "campaign", "device", "to_number",
+)
+
+
+def archive_messages(chunk_size=CHUNK_SIZE, max_chunks=MAX_CHUNKS_PER_RUN):
+    """
+    Scheduler job: move finalized WH Massage rows older than `archive_after_days` into
+    WH Massage Archive, so the live table only holds recent and in-flight traffic.
+    - Works oldest first in chunks, each copied with one multi-row insert, deleted by name
+      (with its versions and comments) and committed, so no lock is held for long.
+    - Pending, Retrying and PDF-waiting messages are never archived.
+    Disabled while `archive_after_days` is 0. Returns the number of archived messages.
+    """
+    days = get_settings().archive_after_days
+    if not days:
+        return 0
+
+    cutoff = frappe.utils.add_days(frappe.utils.now_datetime(), -days)
+    archived = 0
+    for _ in range(max_chunks):
+        rows = frappe.get_all(
+            "WH Massage",
+            filters={
+                "creation": ["<", cutoff],
+                # NULL statuses (drafts, inbound rows) count as final: `not in` compares via ifnull
+                "status": ["not in", ACTIVE_STATUSES],
+                "attachment_pending": 0,
+            },
+            fields=["name", "creation", *ARCHIVED_FIELDS],
+            order_by="creation asc",
+            limit=chunk_size,
+        )
+        if not rows:
+            break
+
+        archive_chunk(rows)
+        frappe.db.commit()
+        archived += len(rows)
+        if len(rows) < chunk_size:
+            break
+
+    return archived
+
+
+def archive_chunk(rows):
+    now = frappe.utils.now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "WH Massage Archive",
+        fields=["name", "creation", "modified", "owner", "modified_by", "message_creation", "archived_on", *ARCHIVED_FIELDS],
+        values=[
+            (row.name, now, now, user, user, row.creation, now, *(row[field] for field in ARCHIVED_FIELDS))
+            for row in rows
+        ],
+        ignore_duplicates=True,
+    )
+
+    names = [row.name for row in rows]
+    frappe.db.delete("WH Massage", {"name": ["in", names]})
+    frappe.db.delete("Version", {"ref_doctype": "WH Massage", "docname": ["in", names]})
+    frappe.db.delete("Comment", {"reference_doctype": "WH Massage", "reference_name": ["in", names]})
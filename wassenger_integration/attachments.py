@@ -0,0 +1,93 @@
+import frappe
+
+from wassenger_integration.metrics import timed
+from wassenger_integration.outbound import enqueue_outbound_queue
+from wassenger_integration.settings import get_settings
+
+
+def enqueue_document_pdf(doctype, name):
+    """
+    Render the document's PDF in a background worker once the current transaction commits.
+    Several messages for the same document share one job.
+    """
+    frappe.enqueue(
+        "wassenger_integration.attachments.attach_document_pdf",
+        queue="long",
+        job_id=f"wassenger_pdf::{doctype}::{name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        doctype=doctype,
+        name=name,
+    )
+
+
+def get_document_pdf(doctype, name, print_format=None):
+    """
+    Return the URL of the document's rendered PDF, rendering and storing it only once.
+    - The PDF is saved as a File attached to the document, so Frappe records its content hash
+      and every later message (resends, retries, other recipients) reuses the same file.
+    - In "URL" mode Wassenger fetches the file through a public URL, so it is stored as a public
+      File whose name carries a random token. In "Direct Upload" mode it is streamed from disk
+      and stays private.
+    """
+    print_format = print_format or frappe.get_meta(doctype).default_print_format or "Standard"
+    prefix = frappe.scrub(f"{doctype}-{name}-{print_format}")
+    is_private = int(get_settings().file_upload_mode == "Direct Upload")
+
+    existing = frappe.get_all(
+        "File",
+        filters={
+            "attached_to_doctype": doctype,
+            "attached_to_name": name,
+            "file_name": ["like", f"{prefix}-%.pdf"],
+            "is_private": is_private,
+        },
+        pluck="file_url",
+        limit=1,
+    )
+    if existing:
+        return existing[0]
+
+    with timed("pdf_render"):
+        pdf = frappe.get_print(doctype, name, print_format, as_pdf=True)
+    file = frappe.get_doc({
+        "doctype": "File",
+        "file_name": f"{prefix}-{frappe.generate_hash(length=12)}.pdf",
+        "attached_to_doctype": doctype,
+        "attached_to_name": name,
+        "is_private": is_private,
+        "content": pdf,
+    })
+    file.insert(ignore_permissions=True)
+    return file.file_url
+
+
+def attach_document_pdf(doctype, name):
+    """
+    Background job: render the PDF for a submitted document and hand it to every WH Massage
+    still waiting on it, then wake the outbound queue.
+    If rendering fails, the messages go out as text only rather than staying stuck.
+    """
+    waiting = frappe.get_all(
+        "WH Massage",
+        filters={"reference_doctype": doctype, "reference_name": name, "attachment_pending": 1},
+        pluck="name",
+    )
+    if not waiting:
+        return
+
+    try:
+        file_url = get_document_pdf(doctype, name)
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(f"Error rendering WhatsApp PDF for {doctype} {name}")
+        file_url = None
+
+    frappe.db.set_value(
+        "WH Massage",
+        {"name": ["in", waiting]},
+        {"file": file_url, "attachment_pending": 0},
+        update_modified=False,
+    )
+    frappe.db.commit()
+    enqueue_outbound_queue()
@@ -0,0 +1,76 @@
+"""
+Count the SQL queries it takes to create one outbound WH Massage.
+
+    bench --site <site> execute wassenger_integration.benchmarks.creation_queries.run
+    bench --site <site> execute wassenger_integration.benchmarks.creation_queries.run --kwargs "{'count': 50}"
+
+`legacy` replays the sequence the app used to issue (insert, two set_value calls and a reload in
+after_insert, another reload, submit, a status re-read in on_submit); `single_pass` is the
+current path (one insert with docstatus=1). Everything is rolled back afterwards.
+"""
+
+from contextlib import contextmanager
+
+import frappe
+
+
+@contextmanager
+def count_queries():
+    """
+    Count every `frappe.db.sql` call made inside the block; yields a one-item list with the count.
+    """
+    counter = [0]
+    original_sql = frappe.db.sql
+
+    def counting_sql(*args, **kwargs):
+        counter[0] += 1
+        return original_sql(*args, **kwargs)
+
+    frappe.db.sql = counting_sql
+    try:
+        yield counter
+    finally:
+        frappe.db.sql = original_sql
+
+
+def get_message(index):
+    return {
+        "doctype": "WH Massage",
+        "phone": "+14155552671",
+        "send_message": f"Query count benchmark {index}",
+        "type": "out",
+    }
+
+
+def create_legacy(index):
+    doc = frappe.get_doc(get_message(index))
+    doc.insert(ignore_permissions=True)
+    # what the old after_insert did
+    frappe.db.set_value(doc.doctype, doc.name, "type", "out")
+    frappe.db.set_value(doc.doctype, doc.name, "status", "Pending")
+    doc.reload()
+    # what the old submit hook did
+    doc.reload()
+    doc.submit()
+    # what the old on_submit did before sending
+    frappe.db.get_value(doc.doctype, doc.name, "status")
+
+
+def create_single_pass(index):
+    frappe.get_doc({**get_message(index), "docstatus": 1}).insert(ignore_permissions=True)
+
+
+def run(count=20):
+    results = {}
+    for label, create in (("legacy", create_legacy), ("single_pass", create_single_pass)):
+        # warm up metadata caches so they do not skew the first measurement
+        create(-1)
+        with count_queries() as counter:
+            for index in range(count):
+                create(index)
+        results[label] = counter[0] / count
+        frappe.db.rollback()
+
+    for label, queries in results.items():
+        print(f"{label:<12} {queries:6.1f} queries per message")
+    return results
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark: per-message latency of bare `requests.post` versus the pooled WassengerClient.
+
+    python -m wassenger_integration.benchmarks.http_client --requests 500
+    python -m wassenger_integration.benchmarks.http_client --certfile cert.pem --keyfile key.pem
+
+Pass a certificate to run the stub over TLS, which is where connection reuse pays off most.
+"""
+
+import argparse
+import statistics
+import time
+
+import requests
+
+from wassenger_integration.benchmarks.stub_server import StubServer
+from wassenger_integration.client import WassengerClient
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(send, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        send()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    print(
+        f"{label:<16} p50={percentile(samples, 50):7.2f}ms  p99={percentile(samples, 99):7.2f}ms  "
+        f"mean={statistics.mean(samples):7.2f}ms  n={len(samples)}"
+    )
+
+
+def run(count=200, latency=0, certfile=None, keyfile=None):
+    with StubServer(latency=latency, certfile=certfile, keyfile=keyfile) as server:
+        url = f"{server.base_url}/messages"
+        payload = {"phone": "+14155552671", "message": "Benchmark"}
+        headers = {"content-type": "application/json", "token": "benchmark"}
+
+        # The stub uses a throwaway self-signed certificate, so skip verification on both sides
+        bare = measure(lambda: requests.post(url, json=payload, headers=headers, timeout=15, verify=False), count)
+
+        client = WassengerClient("benchmark", base_url=server.base_url)
+        pooled = measure(lambda: client.post("messages", json=payload, verify=False), count)
+        client.close()
+
+    report("requests.post", bare)
+    report("WassengerClient", pooled)
+    return {"bare": bare, "pooled": pooled}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0, help="Simulated server latency in seconds")
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args()
+
+    if args.certfile:
+        import urllib3
+
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    run(args.requests, args.latency, args.certfile, args.keyfile)
@@ -0,0 +1,273 @@
+"""
+Load test of the send path against the local stub server: the on-submit hook, bulk sending
+through the outbound queue and webhook ingestion, at configurable volumes.
+
+    bench --site <test-site> execute wassenger_integration.benchmarks.load_test.run
+    bench --site <test-site> execute wassenger_integration.benchmarks.load_test.run \\
+        --kwargs "{'messages': 5000, 'latency': 0.05, 'rate_limit_rate': 0.01, 'concurrency': 16}"
+
+Reports messages (or events) per second, p50/p99 latency per message and SQL queries per
+message for each scenario. Settings are overridden for the run only (stub URL, no rate limit,
+a Sales Invoice submit rule, no devices, no coalescing). Sending and webhook ingestion commit, so the rows it
+creates are deleted at the end; use a test site, as the fake recipients' conversations are
+removed too.
+"""
+
+import dataclasses
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+
+from wassenger_integration.benchmarks.creation_queries import count_queries
+from wassenger_integration.benchmarks.http_client import percentile
+from wassenger_integration.benchmarks.stub_server import StubServer
+
+UNLIMITED = 10**9
+
+
+def get_phone(index):
+    return f"+1555{index:07d}"
+
+
+@dataclasses.dataclass
+class ScenarioResult:
+    name: str
+    count: int
+    seconds: float
+    queries: int
+    latencies_ms: list
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "per_second": round(self.count / self.seconds, 1) if self.seconds else None,
+            "p50_ms": round(percentile(self.latencies_ms, 50), 2) if self.latencies_ms else None,
+            "p99_ms": round(percentile(self.latencies_ms, 99), 2) if self.latencies_ms else None,
+            "mean_ms": round(statistics.mean(self.latencies_ms), 2) if self.latencies_ms else None,
+            "queries_per_item": round(self.queries / self.count, 2) if self.count else None,
+        }
+
+
+def timed_call(function, latencies):
+    """
+    Wrap `function` so each call's duration is appended to `latencies` (thread safe: list.append).
+    """
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    return wrapper
+
+
+def use_stub_settings(server):
+    """
+    Point this job's settings snapshot at the stub (see `settings.get_settings`), with a
+    Sales Invoice submit rule as the only WhatsApp Event Rule.
+    """
+    from wassenger_integration.event_rules import EventRule
+    from wassenger_integration.settings import get_settings
+
+    frappe.local.wassenger_settings = dataclasses.replace(
+        get_settings(),
+        api_key="benchmark",
+        base_url=server.base_url,
+        allow_send_pdf_attachment=False,
+        rate_limit_per_minute=UNLIMITED,
+        rate_limit_burst=UNLIMITED,
+        devices=(),
+        coalesce_window_minutes=0,
+    )
+    frappe.local.wassenger_event_rules = {
+        ("Sales Invoice", "on_submit"): (EventRule(
+            name="benchmark",
+            version="",
+            document_type="Sales Invoice",
+            event="on_submit",
+            party_type="Customer",
+            party_type_field=None,
+            party_field="customer",
+            phone_source="Party, then Document Field",
+            phone_field="contact_mobile",
+            template=None,
+            condition=None,
+            attach_pdf=False,
+        ),),
+    }
+
+
+def bench_submit_hook(run_id, count):
+    """
+    The Sales Invoice on-submit hook: rule lookup, template render, phone resolution and
+    WH Massage insert.
+    """
+    from wassenger_integration.event_rules import handle_doc_event
+
+    invoices = [
+        frappe._dict({
+            "doctype": "Sales Invoice",
+            "name": f"{run_id}-hook-{index}",
+            "customer": f"{run_id} Customer",
+            "customer_name": f"Customer {index}",
+            "contact_mobile": get_phone(index),
+            "posting_date": frappe.utils.today(),
+            "due_date": frappe.utils.today(),
+            "grand_total": 100 + index,
+            "currency": "USD",
+        })
+        for index in range(count)
+    ]
+    latencies = []
+    hook = timed_call(handle_doc_event, latencies)
+
+    start = time.perf_counter()
+    with count_queries() as queries:
+        for invoice in invoices:
+            hook(invoice, "on_submit")
+        frappe.db.commit()
+    return ScenarioResult("submit_hook", count, time.perf_counter() - start, queries[0], latencies)
+
+
+def bench_bulk_send(run_id, count, concurrency):
+    """
+    Queue messages with the bulk insert path, then drain them through the outbound queue.
+    """
+    from wassenger_integration import api
+    from wassenger_integration.outbound import insert_outbound_messages, send_pending_messages
+
+    settings = api.get_wassenger_settings()
+    messages = [
+        {
+            "phone": get_phone(index),
+            "message": f"Load test message {index}",
+            "reference_doctype": "Sales Invoice",
+            "reference_name": f"{run_id}-bulk-{index}",
+        }
+        for index in range(count)
+    ]
+    insert_outbound_messages(messages, settings)
+    frappe.db.commit()
+
+    latencies = []
+    deliver_message = api.deliver_message
+    api.deliver_message = timed_call(deliver_message, latencies)
+    sent = 0
+    start = time.perf_counter()
+    try:
+        with count_queries() as queries:
+            # Rate-limited runs stop early and leave the rest Pending: keep draining until done
+            while True:
+                summary = send_pending_messages(
+                    limit=count,
+                    concurrency=concurrency,
+                    filters={"reference_name": ["like", f"{run_id}-bulk-%"]},
+                )
+                if not summary or not (summary["sent"] + summary["failed"] + summary["deferred"]):
+                    break
+                sent += summary["sent"]
+                if summary["deferred"]:
+                    time.sleep(1)
+    finally:
+        api.deliver_message = deliver_message
+    return ScenarioResult("bulk_send", sent, time.perf_counter() - start, queries[0], latencies)
+
+
+def bench_webhooks(run_id, server, count):
+    """
+    Buffer delivery acks for the stub's messages plus `count` inbound replies, as the webhook
+    endpoints do, then apply them with the batch consumer.
+    """
+    from wassenger_integration.benchmarks.stub_server import reply_payload
+    from wassenger_integration.webhooks import apply_webhook_events, buffer_webhook_event
+
+    events = [
+        ("status", {"message_id": message["id"], "status": "Delivered"}, f"{message['id']}:Delivered")
+        for message in server.messages
+    ]
+    for index in range(count):
+        reply = reply_payload(get_phone(index), f"Reply {index}", message_id=f"{run_id}-in-{index}")["data"]
+        events.append((
+            "reply",
+            {
+                "message_id": reply["id"],
+                "phone": reply["fromNumber"],
+                "to_number": reply["toNumber"],
+                "body": reply["body"],
+                "status": reply["status"],
+                "timestamp": reply["timestamp"],
+                "chat_id": reply["chat"]["id"],
+                "contact_name": reply["chat"]["contact"]["displayName"],
+            },
+            f"{reply['id']}:in",
+        ))
+
+    latencies = []
+    buffer = timed_call(buffer_webhook_event, latencies)
+    start = time.perf_counter()
+    with count_queries() as queries:
+        for kind, payload, dedupe_key in events:
+            buffer(kind, payload, dedupe_key=dedupe_key)
+        apply_webhook_events(max_batches=UNLIMITED)
+    return ScenarioResult("webhooks", len(events), time.perf_counter() - start, queries[0], latencies)
+
+
+def cleanup(run_id, count):
+    frappe.db.delete("WH Massage", {"reference_name": ["like", f"{run_id}-%"]})
+    frappe.db.delete("WH Massage", {"wassenger_message_id": ["like", f"{run_id}-in-%"]})
+    frappe.db.delete("WhatsApp Conversation", {"name": ["in", [get_phone(index) for index in range(count)]]})
+    frappe.db.commit()
+
+
+def run(
+    messages=1000,
+    replies=None,
+    concurrency=8,
+    latency=0.02,
+    jitter=0.01,
+    conflict_rate=0,
+    rate_limit_rate=0,
+    error_rate=0,
+):
+    """
+    Run every scenario against a fresh stub server and print a report; returns it as a dict.
+    """
+    run_id = f"LOADTEST-{frappe.generate_hash(length=6)}"
+    replies = messages if replies is None else replies
+    enqueue = frappe.enqueue
+    # Background jobs would race the measured consumers for the same rows and events
+    frappe.enqueue = lambda *args, **kwargs: None
+
+    results = []
+    try:
+        with StubServer(
+            latency=latency,
+            jitter=jitter,
+            conflict_rate=conflict_rate,
+            rate_limit_rate=rate_limit_rate,
+            error_rate=error_rate,
+        ) as server:
+            use_stub_settings(server)
+            results.append(bench_submit_hook(run_id, messages))
+            results.append(bench_bulk_send(run_id, messages, concurrency))
+            results.append(bench_webhooks(run_id, server, replies))
+            stub_counts = server.counts
+    finally:
+        frappe.enqueue = enqueue
+        frappe.local.wassenger_settings = None
+        frappe.local.wassenger_event_rules = None
+        cleanup(run_id, max(messages, replies))
+
+    report = {result.name: result.as_dict() for result in results}
+    print(f"{'scenario':<12} {'count':>7} {'per sec':>9} {'p50 ms':>8} {'p99 ms':>8} {'queries/item':>13}")
+    for name, row in report.items():
+        print(
+            f"{name:<12} {row['count']:>7} {row['per_second'] or 0:>9} {row['p50_ms'] or 0:>8} "
+            f"{row['p99_ms'] or 0:>8} {row['queries_per_item'] or 0:>13}"
+        )
+    print(f"stub: {stub_counts}")
+    report["stub"] = stub_counts
+    return report
@@ -0,0 +1,240 @@
+"""
+Local stand-in for the Wassenger API, used by the benchmarks and tests.
+
+Answers `POST /v1/files` and `POST /v1/messages` with Wassenger-shaped JSON over
+HTTP/1.1 keep-alive, optionally over TLS so handshake cost shows up in measurements.
+Latency, 409 "file already uploaded" answers, 429 rate limits and 5xx errors can be
+injected at configurable rates, messages can be made to reject file IDs it did not hand out
+(like an expired upload), and the messages it accepted can be acknowledged or
+answered through the app's webhook endpoints (see `ack_messages` and `reply_payload`).
+"""
+
+import json
+import random
+import ssl
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle + delayed ACK
+    # adds ~40ms to every keep-alive response and hides the pooling gain.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("content-length") or 0)
+        raw = self.rfile.read(length)
+        if server.latency or server.jitter:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+
+        path = self.path.rstrip("/")
+        if not path.endswith(("/files", "/messages")):
+            self.reply(404, {"status": 404, "message": "Not found"})
+            return
+
+        server.record("requests")
+        if random.random() < server.rate_limit_rate:
+            server.record("rate_limited")
+            self.reply(429, {"status": 429, "message": "Too many requests"}, {"retry-after": str(server.retry_after)})
+            return
+        if random.random() < server.error_rate:
+            server.record("errors")
+            self.reply(500, {"status": 500, "message": "Internal server error"})
+            return
+
+        if path.endswith("/files"):
+            file_id = uuid.uuid4().hex
+            server.record(
+                "files", upload={"content_type": self.headers.get("content-type"), "size": length}, file_id=file_id
+            )
+            if random.random() < server.conflict_rate:
+                # Wassenger answers a re-upload of known content with the existing file ID
+                self.reply(409, {"status": 409, "message": "File already exists", "meta": {"file": file_id}})
+                return
+            self.reply(201, [{"id": file_id}])
+            return
+
+        try:
+            data = json.loads(raw or b"{}")
+        except ValueError:
+            self.reply(400, {"status": 400, "message": "Invalid JSON"})
+            return
+        if not data.get("phone") or not (data.get("message") or data.get("media")):
+            self.reply(400, {"status": 400, "message": "Missing phone or message"})
+            return
+        if server.known_files_only and data.get("media") and data["media"].get("file") not in server.file_ids:
+            self.reply(400, {"status": 400, "message": "File not found"})
+            return
+
+        message_id = uuid.uuid4().hex
+        server.record("messages", message_id=message_id, data=data)
+        self.reply(201, {"id": message_id, "status": "queued", "deliveryStatus": "queued", "phone": data["phone"]})
+
+    def reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(payload)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency=0,
+        jitter=0,
+        conflict_rate=0,
+        rate_limit_rate=0,
+        error_rate=0,
+        retry_after=1,
+        known_files_only=False,
+    ):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.conflict_rate = conflict_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.known_files_only = known_files_only
+        self.counts = {"requests": 0, "files": 0, "messages": 0, "rate_limited": 0, "errors": 0}
+        self.messages = []
+        self.uploads = []
+        self.file_ids = set()
+        self.lock = threading.Lock()
+
+    def record(self, counter, message_id=None, data=None, upload=None, file_id=None):
+        with self.lock:
+            self.counts[counter] += 1
+            if file_id:
+                self.file_ids.add(file_id)
+            if message_id:
+                self.messages.append({"id": message_id, **data})
+            if upload:
+                self.uploads.append(upload)
+
+
+class StubServer:
+    """
+    Run the stub in a background thread:
+
+        with StubServer(latency=0.005, rate_limit_rate=0.01) as server:
+            client = WassengerClient("key", base_url=server.base_url)
+            ...
+            server.counts, server.messages
+
+    Rates are probabilities per request (0 to 1); `latency` and `jitter` are in seconds.
+    With `known_files_only`, messages with a file ID the stub did not hand out are rejected.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0,
+        jitter=0,
+        conflict_rate=0,
+        rate_limit_rate=0,
+        error_rate=0,
+        retry_after=1,
+        known_files_only=False,
+        certfile=None,
+        keyfile=None,
+    ):
+        self.httpd = StubHTTPServer(
+            (host, port),
+            latency=latency,
+            jitter=jitter,
+            conflict_rate=conflict_rate,
+            rate_limit_rate=rate_limit_rate,
+            error_rate=error_rate,
+            retry_after=retry_after,
+            known_files_only=known_files_only,
+        )
+        scheme = "http"
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+            scheme = "https"
+        self.base_url = f"{scheme}://{host}:{self.httpd.server_address[1]}/v1"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def counts(self):
+        return dict(self.httpd.counts)
+
+    @property
+    def messages(self):
+        """
+        Messages accepted so far: the request body plus the `id` returned for it.
+        """
+        return list(self.httpd.messages)
+
+    @property
+    def uploads(self):
+        """
+        File uploads received so far: their content type (JSON URL or multipart) and size.
+        """
+        return list(self.httpd.uploads)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def ack_messages(self, webhook_url, ack="delivered", session=None):
+        """
+        POST a status webhook for every accepted message to `webhook_url`
+        (e.g. https://<site>/api/method/wassenger_integration.api.whatsapp_status_update).
+        """
+        session = session or requests.Session()
+        for message in self.messages:
+            session.post(webhook_url, json=ack_payload(message["id"], ack), timeout=15)
+
+
+def ack_payload(message_id, ack="delivered"):
+    """
+    Body of a Wassenger `message:out:ack` webhook.
+    """
+    return {"event": "message:out:ack", "id": message_id, "data": {"id": message_id, "ack": ack}}
+
+
+def reply_payload(from_number, body, to_number="+14155550100", message_id=None, contact_name=None):
+    """
+    Body of a Wassenger `message:in:new` webhook (an inbound message).
+    """
+    message_id = message_id or uuid.uuid4().hex
+    return {
+        "event": "message:in:new",
+        "data": {
+            "id": message_id,
+            "fromNumber": from_number,
+            "toNumber": to_number,
+            "body": body,
+            "status": "received",
+            "timestamp": int(time.time()),
+            "chat": {
+                "id": f"{from_number.lstrip('+')}@c.us",
+                "contact": {"displayName": contact_name or from_number},
+            },
+        },
+    }
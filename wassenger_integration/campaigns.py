@@ -0,0 +1,176 @@
+import frappe
+from frappe.utils import add_days, cint, date_diff, flt, getdate, now_datetime, today
+
+from wassenger_integration.message_templates import (
+    PAYMENT_REMINDER_TEMPLATE,
+    compile_template,
+    render_template,
+)
+from wassenger_integration.metrics import record_samples, timed
+from wassenger_integration.outbound import enqueue_outbound_queue, insert_outbound_messages
+from wassenger_integration.phone import resolve_party_phones
+from wassenger_integration.settings import get_settings
+
+CHUNK_SIZE = 500
+CAMPAIGN_TIMEOUT_SECONDS = 4 * 60 * 60
+# Always fetched: they select the recipient and feed the built-in reminder template
+INVOICE_FIELDS = (
+    "name", "customer", "customer_name", "company", "currency", "due_date", "outstanding_amount", "contact_mobile",
+)
+
+
+def enqueue_campaign(campaign):
+    """
+    Run a campaign in a long-queue worker once the current transaction commits.
+    """
+    frappe.enqueue(
+        "wassenger_integration.campaigns.run_campaign",
+        queue="long",
+        timeout=CAMPAIGN_TIMEOUT_SECONDS,
+        job_id=f"wassenger_campaign::{campaign}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        campaign=campaign,
+    )
+
+
+def enqueue_due_campaigns():
+    """
+    Scheduler job: start Scheduled campaigns whose start time has come.
+    """
+    for campaign in frappe.get_all(
+        "WhatsApp Campaign",
+        filters={"status": "Scheduled", "scheduled_at": ["<=", now_datetime()]},
+        pluck="name",
+    ):
+        frappe.db.set_value("WhatsApp Campaign", campaign, "status", "Queued")
+        enqueue_campaign(campaign)
+
+
+def get_invoice_filters(campaign):
+    """
+    Set-based selection of the overdue Sales Invoices a campaign targets.
+    """
+    filters = [
+        ["docstatus", "=", 1],
+        ["is_return", "=", 0],
+        ["outstanding_amount", ">", max(flt(campaign.min_outstanding_amount), 0)],
+        ["due_date", "<=", add_days(today(), -cint(campaign.min_days_overdue))],
+    ]
+    if cint(campaign.max_days_overdue):
+        filters.append(["due_date", ">=", add_days(today(), -cint(campaign.max_days_overdue))])
+    if campaign.company:
+        filters.append(["company", "=", campaign.company])
+    return filters
+
+
+def get_invoice_columns(template_fields):
+    """
+    Sales Invoice columns to fetch: the fixed ones plus those the template reads.
+    """
+    meta = frappe.get_meta("Sales Invoice")
+    return list(INVOICE_FIELDS) + [
+        field for field in template_fields
+        if field not in INVOICE_FIELDS and meta.get_field(field) and not meta.get_field(field).is_virtual
+    ]
+
+
+def run_campaign(campaign):
+    """
+    Queue a WhatsApp reminder for every invoice a campaign selects, CHUNK_SIZE invoices at a time.
+    - Invoices are read with keyset pagination on name, so memory stays flat however many match.
+    - Each chunk resolves phones in one batch, renders in memory and stores its messages with
+      multi-row inserts; the cursor and counters are committed with the messages, so a failed
+      or paused campaign resumes exactly after the last queued invoice.
+    - Setting the campaign to Paused stops it after the current chunk.
+    """
+    doc = frappe.get_doc("WhatsApp Campaign", campaign)
+    if doc.status not in ("Queued", "Running"):
+        return
+
+    filters = get_invoice_filters(doc)
+    if not doc.cursor:
+        doc.total_recipients = frappe.db.count("Sales Invoice", filters)
+    doc.db_set({
+        "status": "Running",
+        "started_at": doc.started_at or now_datetime(),
+        "total_recipients": doc.total_recipients,
+        "last_error": None,
+    }, commit=True)
+
+    try:
+        template, fields = compile_template(doc.message_template or PAYMENT_REMINDER_TEMPLATE)
+        columns = get_invoice_columns(fields)
+        settings = get_settings()
+
+        while True:
+            if frappe.db.get_value("WhatsApp Campaign", doc.name, "status") == "Paused":
+                return
+
+            page_filters = [*filters, ["name", ">", doc.cursor]] if doc.cursor else filters
+            rows = frappe.get_all(
+                "Sales Invoice", filters=page_filters, fields=columns, order_by="name asc", limit=CHUNK_SIZE
+            )
+            if not rows:
+                break
+
+            queued, skipped = queue_invoice_reminders(doc.name, rows, template, fields, settings)
+            processed = cint(doc.processed_count) + len(rows)
+            doc.db_set({
+                "cursor": rows[-1].name,
+                "processed_count": processed,
+                "queued_count": cint(doc.queued_count) + queued,
+                "skipped_count": cint(doc.skipped_count) + skipped,
+                "progress": min(processed * 100 / doc.total_recipients, 100) if doc.total_recipients else 0,
+            })
+            if queued:
+                enqueue_outbound_queue()
+            frappe.db.commit()
+            frappe.publish_progress(doc.progress, title=doc.name, doctype=doc.doctype, docname=doc.name)
+
+            if len(rows) < CHUNK_SIZE:
+                break
+
+        doc.db_set({"status": "Completed", "completed_at": now_datetime(), "progress": 100}, commit=True)
+    except Exception:
+        frappe.db.rollback()
+        frappe.db.set_value(doc.doctype, doc.name, {
+            "status": "Failed",
+            "last_error": frappe.get_traceback()[-1000:],
+        })
+        frappe.db.commit()
+        frappe.log_error(f"WhatsApp Campaign {doc.name} failed")
+
+
+def queue_invoice_reminders(campaign, rows, template, fields, settings):
+    """
+    Render and store reminders for one chunk of invoices; returns (queued, skipped).
+    Invoices without a WhatsApp number for their customer (or on the invoice) are skipped.
+    """
+    phones = resolve_party_phones("Customer", list({row.customer for row in rows}))
+    today_date = getdate(today())
+
+    messages = []
+    samples = []
+    skipped = 0
+    for row in rows:
+        phone = phones.get(row.customer) or row.contact_mobile
+        if not phone:
+            skipped += 1
+            continue
+        row.days_overdue = date_diff(today_date, row.due_date)
+        with timed("render", samples):
+            message = render_template(template, fields, row, "Sales Invoice", "Customer")
+        messages.append({
+            "phone": phone,
+            "message": message,
+            "reference_doctype": "Sales Invoice",
+            "reference_name": row.name,
+            "party_type": "Customer",
+            "party": row.customer,
+            "campaign": campaign,
+        })
+
+    record_samples(samples)
+    names, errors = insert_outbound_messages(messages, settings)
+    return len(names) - len(errors), skipped + len(errors)
@@ -0,0 +1,139 @@
+import mimetypes
+import os
+import threading
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+WASSENGER_API_URL = "https://api.wassenger.com/v1"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 15
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class MultipartStream:
+    """
+    A `multipart/form-data` body with a single file field, produced chunk by chunk.
+    The file is read from disk (or a bytes buffer) once per send, straight into the socket,
+    and never held in memory whole. `__len__` lets requests send a Content-Length header
+    instead of chunked encoding; iterating again (e.g. to retry) re-reads the file.
+    """
+
+    def __init__(self, filename, path=None, content=None, field="file", content_type=None):
+        self.path = path
+        self.content = content
+        self.size = os.path.getsize(path) if path else len(content)
+        self.boundary = uuid.uuid4().hex
+        content_type = content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        safe_filename = filename.replace('"', "")
+        self.head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{safe_filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+    @classmethod
+    def from_path(cls, path, filename=None, **kwargs):
+        return cls(filename or os.path.basename(path), path=path, **kwargs)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return len(self.head) + self.size + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        if self.path:
+            with open(self.path, "rb") as file:
+                while chunk := file.read(UPLOAD_CHUNK_SIZE):
+                    yield chunk
+        else:
+            for start in range(0, self.size, UPLOAD_CHUNK_SIZE):
+                yield self.content[start:start + UPLOAD_CHUNK_SIZE]
+        yield self.tail
+
+
+class WassengerClient:
+    """
+    Thin wrapper around a pooled, keep-alive `requests.Session` for the Wassenger API.
+    One client is kept per worker process and API key (see `get_client`), so repeated
+    uploads and sends reuse open TCP/TLS connections instead of handshaking every call.
+    """
+
+    def __init__(
+        self,
+        api_key,
+        base_url=WASSENGER_API_URL,
+        pool_size=DEFAULT_POOL_SIZE,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "content-type": "application/json",
+            "connection": "keep-alive",
+            "token": api_key,
+        })
+
+    def post(self, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(f"{self.base_url}/{path.lstrip('/')}", **kwargs)
+
+    def upload_file(self, file_url):
+        return self.post("files", json={"url": file_url, "format": "native"})
+
+    def upload_file_content(self, path, filename=None):
+        """
+        Upload a local file as a streamed multipart body, so Wassenger does not have to
+        fetch it back from our site.
+        """
+        body = MultipartStream.from_path(path, filename)
+        return self.post("files", data=body, headers={"content-type": body.content_type})
+
+    def send_message(self, data):
+        return self.post("messages", json=data)
+
+    def close(self):
+        self.session.close()
+
+
+def get_client(settings, api_key=None):
+    """
+    Return the shared client for this worker process matching the given settings.
+    `settings` is the snapshot from `settings.get_settings`; a change of API key,
+    pool size or timeouts transparently builds a fresh client.
+    `api_key` selects the client of a device with its own key (defaults to the main key).
+    """
+    key = (
+        api_key or settings.api_key,
+        settings.base_url,
+        settings.http_pool_size,
+        settings.connect_timeout,
+        settings.read_timeout,
+    )
+    client = _clients.get(key)
+    if client:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if not client:
+            # Settings changed: drop stale sessions for this API key before pooling a new one
+            for old_key in [k for k in _clients if k[0] == key[0]]:
+                _clients.pop(old_key).close()
+            client = _clients[key] = WassengerClient(*key)
+    return client
@@ -0,0 +1,85 @@
+import frappe
+
+MAX_PREVIEW_LENGTH = 140
+
+
+def upsert_conversations(entries):
+    """
+    Fold a batch of in/out messages into their WhatsApp Conversations, creating missing ones.
+    Each entry is a dict with phone, direction ("in"/"out"), message, timestamp and optionally
+    chat_id, contact_name, party_type, party and device (the Wassenger device that sent it).
+    Conversations are named by the (normalized) phone, so the phone is also the conversation name.
+    Costs one lookup query, one multi-row insert for new conversations and one UPDATE per
+    existing conversation in the batch, regardless of how many messages it received.
+    """
+    conversations = {}
+    for entry in entries:
+        if not entry.get("phone"):
+            continue
+        conversation = conversations.setdefault(entry["phone"], {"unread": 0, "last": None})
+        if entry["direction"] == "in":
+            conversation["unread"] += 1
+        for field in ("chat_id", "contact_name", "party_type", "party", "device"):
+            if entry.get(field):
+                conversation[field] = entry[field]
+        last = conversation["last"]
+        if not last or entry["timestamp"] >= last["timestamp"]:
+            conversation["last"] = entry
+    if not conversations:
+        return
+
+    existing = set(frappe.get_all(
+        "WhatsApp Conversation", filters={"name": ["in", list(conversations)]}, pluck="name"
+    ))
+
+    now = frappe.utils.now()
+    user = frappe.session.user
+    new_rows = []
+    for phone, conversation in conversations.items():
+        last = conversation["last"]
+        values = {
+            "chat_id": conversation.get("chat_id"),
+            "contact_name": conversation.get("contact_name"),
+            "party_type": conversation.get("party_type"),
+            "party": conversation.get("party"),
+            "device": conversation.get("device"),
+            "last_message": (last.get("message") or "")[:MAX_PREVIEW_LENGTH],
+            "last_message_at": last["timestamp"],
+            "last_direction": last["direction"],
+            "unread": conversation["unread"],
+        }
+        if phone in existing:
+            frappe.db.sql(
+                """
+                update `tabWhatsApp Conversation`
+                set last_message = %(last_message)s,
+                    last_message_at = %(last_message_at)s,
+                    last_direction = %(last_direction)s,
+                    unread_count = unread_count + %(unread)s,
+                    chat_id = coalesce(%(chat_id)s, chat_id),
+                    contact_name = coalesce(%(contact_name)s, contact_name),
+                    party_type = coalesce(party_type, %(party_type)s),
+                    party = coalesce(party, %(party)s),
+                    device = coalesce(%(device)s, device),
+                    modified = %(modified)s
+                where name = %(name)s
+                """,
+                {**values, "name": phone, "modified": now},
+            )
+        else:
+            new_rows.append((
+                phone, now, now, user, user, phone, values["chat_id"], values["contact_name"],
+                values["party_type"], values["party"], values["device"], values["last_message"],
+                values["last_message_at"], values["last_direction"], values["unread"],
+            ))
+
+    if new_rows:
+        frappe.db.bulk_insert(
+            "WhatsApp Conversation",
+            fields=[
+                "name", "creation", "modified", "owner", "modified_by", "phone", "chat_id", "contact_name",
+                "party_type", "party", "device", "last_message", "last_message_at", "last_direction", "unread_count",
+            ],
+            values=new_rows,
+            ignore_duplicates=True,
+        )
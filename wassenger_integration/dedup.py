@@ -0,0 +1,128 @@
+import hashlib
+
+import frappe
+
+SEND_LOCK_PREFIX = "wassenger_send_lock"
+# Longer than any single send (rate limit wait + upload + post) can take
+SEND_LOCK_SECONDS = 10 * 60
+# How long a message waits while an identical one is being sent by another worker
+DUPLICATE_DEFER_SECONDS = 60
+# Statuses of a message Wassenger accepted (Failed after an ack is not one of them)
+SENT_STATUSES = ("Queued", "Sent", "Delivered", "Read")
+
+# Take the lock, or keep it if this message already holds it (a run that died mid-send)
+CLAIM_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return 1
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def get_dedup_key(reference_doctype, reference_name, phone, message):
+    """
+    Idempotency key of an outbound message: the document it is about, the recipient and a hash
+    of the text. Two messages with the same key are the same message.
+    The attachment is left out: document PDFs are attached after the message is created (see
+    `attachments.attach_document_pdf`), and the reference already says which document it is.
+    """
+    content = "\x1f".join(str(value or "") for value in (reference_doctype, reference_name, phone, message))
+    return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+
+def get_send_lock_key(dedup_key):
+    return frappe.cache().make_key(f"{SEND_LOCK_PREFIX}:{dedup_key}")
+
+
+def claim_messages(messages, settings):
+    """
+    Take the send lock of each prepared message (see `api.prepare_messages`) before delivering it,
+    so repeated or concurrent triggers of the same message (amended copies, double clicks, a
+    manual send racing the queue) collapse into one API call.
+    Returns `(claimed, updates)`: the messages to deliver, and WH Massage updates for the rest:
+    - Messages that already have a Wassenger message ID are not sent again.
+    - Messages whose dedup key another WH Massage created in the last `dedup_window_hours`
+      has already sent become Duplicate; older sends do not count, so recurring reminders
+      with the same text still go out.
+    - Messages whose dedup key another worker is sending right now are deferred for a minute;
+      by then that send has either succeeded (Duplicate) or failed (this one is sent).
+    Costs one query and one Redis round-trip per batch. Locks of sent messages are kept until
+    they expire, so the Sent row is committed before anyone else can claim the key.
+    """
+    updates = {}
+    candidates = []
+    for message in messages:
+        if message.wassenger_message_id:
+            updates[message.name] = {"status": "Sent"}
+        else:
+            candidates.append(message)
+
+    dedup_keys = list({message.dedup_key for message in candidates if message.dedup_key})
+    if not dedup_keys:
+        return candidates, updates
+
+    sent_as = dict(frappe.get_all(
+        "WH Massage",
+        filters={
+            "dedup_key": ["in", dedup_keys],
+            "status": ["in", SENT_STATUSES],
+            "wassenger_message_id": ["is", "set"],
+            "creation": [">", frappe.utils.add_to_date(None, hours=-settings.dedup_window_hours)],
+        },
+        fields=["dedup_key", "name"],
+        as_list=True,
+    ))
+
+    to_lock = []
+    claimed = []
+    for message in candidates:
+        if not message.dedup_key:
+            claimed.append(message)
+        elif message.dedup_key in sent_as:
+            updates[message.name] = {"status": "Duplicate", "last_error": f"Already sent as {sent_as[message.dedup_key]}"}
+        else:
+            to_lock.append(message)
+    if not to_lock:
+        return claimed, updates
+
+    cache = frappe.cache()
+    claim = cache.register_script(CLAIM_SCRIPT)
+    pipeline = cache.pipeline()
+    for message in to_lock:
+        claim(keys=[get_send_lock_key(message.dedup_key)], args=[message.name, SEND_LOCK_SECONDS], client=pipeline)
+
+    retry_at = frappe.utils.add_to_date(frappe.utils.now_datetime(), seconds=DUPLICATE_DEFER_SECONDS)
+    for message, granted in zip(to_lock, pipeline.execute(), strict=True):
+        if granted:
+            claimed.append(message)
+        else:
+            updates[message.name] = {"next_attempt_at": retry_at}
+    return claimed, updates
+
+
+def release_messages(results):
+    """
+    Release the send locks of delivery results (see `api.deliver_message`) that were not sent,
+    so a retry, or an identical message, can be sent.
+    """
+    unsent = [result for result in results if result.dedup_key and result.status != "Sent"]
+    if not unsent:
+        return
+
+    cache = frappe.cache()
+    release = cache.register_script(RELEASE_SCRIPT)
+    pipeline = cache.pipeline()
+    for result in unsent:
+        release(keys=[get_send_lock_key(result.dedup_key)], args=[result.name], client=pipeline)
+    pipeline.execute()
@@ -0,0 +1,180 @@
+from io import BytesIO
+
+import frappe
+
+from wassenger_integration.api import get_local_file_path, get_readable_file_urls
+from wassenger_integration.metrics import timed
+from wassenger_integration.outbound import insert_outbound_messages
+
+MAX_PHONES_PER_RUN = 500
+# Digests longer than this are split, to stay well under WhatsApp's message size limit
+MAX_DIGEST_LENGTH = 4000
+DIGEST_SEPARATOR = "\n\n━━━━━━━━━━\n\n"
+DIGEST_FIELDS = ["name", "owner", "phone", "send_message", "file", "party_type", "party", "campaign"]
+
+
+def coalesce_pending_messages(settings, filters=None):
+    """
+    Fold bursts of pending messages for the same phone into digest messages.
+    New messages are held for `coalesce_window_minutes` (see `outbound.get_coalescing_hold`).
+    Once any message of a phone is due, all its untried pending messages are combined into
+    one digest (split if very long), sent like any other message; the originals are marked
+    Coalesced and linked to their digest.
+    - With `merge_digest_pdfs`, their PDFs are merged into one attachment; otherwise messages
+      with an attachment are left out of digests and sent on their own.
+    - A PDF is only carried into a digest if the owner of its message may read it (see
+      `api.get_readable_file_urls`); groups with one that is not are sent one by one.
+    Costs two queries, one multi-row insert and one batched update per run.
+    """
+    base_filters = {
+        "type": "out",
+        "docstatus": 1,
+        "status": "Pending",
+        "attempts": 0,
+        "attachment_pending": 0,
+        "is_digest": 0,
+        **(filters or {}),
+    }
+    if not settings.merge_digest_pdfs:
+        base_filters["file"] = ["is", "not set"]
+
+    phones = frappe.get_all(
+        "WH Massage",
+        filters={**base_filters, "next_attempt_at": ["<=", frappe.utils.now_datetime()]},
+        pluck="phone",
+        distinct=True,
+        limit=MAX_PHONES_PER_RUN,
+    )
+    if not phones:
+        return
+
+    messages_by_phone = {}
+    for row in frappe.get_all(
+        "WH Massage",
+        filters={**base_filters, "phone": ["in", phones]},
+        fields=DIGEST_FIELDS,
+        order_by="creation asc",
+    ):
+        messages_by_phone.setdefault(row.phone, []).append(row)
+
+    readable_files = get_readable_files(
+        [row for rows in messages_by_phone.values() if len(rows) > 1 for row in rows]
+    )
+    digests = []
+    members = []
+    for rows in messages_by_phone.values():
+        if len(rows) < 2:
+            continue
+        for group in split_digest(rows):
+            digest = build_digest(group, settings, readable_files)
+            if digest:
+                digests.append(digest)
+                members.append(group)
+    if not digests:
+        return
+
+    names, _ = insert_outbound_messages(digests, settings, is_digest=True)
+    frappe.db.bulk_update("WH Massage", {
+        row.name: {"status": "Coalesced", "digest": digest}
+        for digest, group in zip(names, members, strict=True)
+        if digest
+        for row in group
+    })
+
+
+def get_readable_files(rows):
+    """
+    `(owner, file URL)` of each row whose owner may send its file, one permission check per owner.
+    """
+    files_by_owner = {}
+    for row in rows:
+        if row.file:
+            files_by_owner.setdefault(row.owner, set()).add(row.file)
+    return {
+        (owner, file_url)
+        for owner, file_urls in files_by_owner.items()
+        for file_url in get_readable_file_urls(file_urls, owner)
+    }
+
+
+def split_digest(rows):
+    """
+    Split one phone's messages into groups whose combined text fits in a message.
+    """
+    group = []
+    length = 0
+    for row in rows:
+        row_length = len(row.send_message or "") + len(DIGEST_SEPARATOR)
+        if group and length + row_length > MAX_DIGEST_LENGTH:
+            yield group
+            group, length = [], 0
+        group.append(row)
+        length += row_length
+    if group:
+        yield group
+
+
+def build_digest(rows, settings, readable_files):
+    """
+    The digest message for a group of rows: their texts in order, and their merged PDFs.
+    Party, campaign and owner are kept when every message shares them.
+    Returns None if the PDFs cannot be merged, or if a message's owner may not read its PDF
+    (not in `readable_files`); the messages are then sent one by one.
+    """
+    digest = {
+        "phone": rows[0].phone,
+        "message": DIGEST_SEPARATOR.join(row.send_message for row in rows if row.send_message),
+    }
+    for field in ("party_type", "party", "campaign", "owner"):
+        if len({row[field] for row in rows}) == 1:
+            digest[field] = rows[0][field]
+
+    if any(row.file and (row.owner, row.file) not in readable_files for row in rows):
+        return None
+    files = [row.file for row in rows if row.file]
+    if len(files) == 1:
+        digest["file"] = files[0]
+    elif files:
+        try:
+            digest["file"] = merge_pdfs(files, settings)
+        except Exception:
+            frappe.log_error(f"Could not merge WhatsApp digest PDFs for {digest['phone']}")
+            return None
+        if not digest["file"]:
+            return None
+    return digest
+
+
+def merge_pdfs(file_urls, settings):
+    """
+    Merge the PDFs stored at `file_urls` (in order) into one File and return its URL, or None
+    if any of them is not a PDF stored on this site.
+    The merged File is private in "Direct Upload" mode or when any of its PDFs is private, so
+    a digest never publishes a document that was not public already.
+    """
+    # pypdf ships with Frappe (it is what frappe.utils.pdf uses)
+    from pypdf import PdfWriter
+
+    paths = [get_local_file_path(file_url) for file_url in file_urls]
+    if not all(path and path.lower().endswith(".pdf") for path in paths):
+        return None
+
+    writer = PdfWriter()
+    with timed("pdf_render"):
+        for path in paths:
+            writer.append(path)
+
+        content = BytesIO()
+        writer.write(content)
+
+    file = frappe.get_doc({
+        "doctype": "File",
+        "file_name": f"whatsapp-digest-{frappe.generate_hash(length=12)}.pdf",
+        "is_private": int(
+            settings.file_upload_mode == "Direct Upload"
+            or any(file_url.startswith("/private/") for file_url in file_urls)
+        ),
+        "content": content.getvalue(),
+    })
+    file.insert(ignore_permissions=True)
+    return file.file_url
@@ -0,0 +1,191 @@
+from dataclasses import dataclass
+
+import frappe
+
+from wassenger_integration.attachments import enqueue_document_pdf
+from wassenger_integration.message_templates import compile_template, get_compiled_template, render_template
+from wassenger_integration.metrics import timed
+from wassenger_integration.phone import resolve_party_phone
+from wassenger_integration.settings import get_settings
+
+EVENT_RULES_CACHE_KEY = "wassenger_event_rules"
+
+# Document events a WhatsApp Event Rule can react to: rule label -> doc_events method.
+# Every one of them is hooked for "*" in hooks.py.
+EVENTS = {
+    "Submit": "on_submit",
+    "Cancel": "on_cancel",
+    "Insert": "after_insert",
+    "Save": "on_update",
+}
+
+PHONE_FROM_PARTY = "Party"
+PHONE_FROM_FIELD = "Document Field"
+PHONE_FROM_PARTY_THEN_FIELD = "Party, then Document Field"
+
+# Per-worker cache of compiled rule templates: {rule name: (version, template, fields)}
+_compiled_templates = {}
+
+
+@dataclass(frozen=True)
+class EventRule:
+    """
+    An enabled WhatsApp Event Rule: who to message, and what, when a document event fires.
+    """
+
+    name: str
+    version: str
+    document_type: str
+    event: str
+    party_type: str | None
+    party_type_field: str | None
+    party_field: str | None
+    phone_source: str
+    phone_field: str | None
+    template: str | None
+    condition: str | None
+    attach_pdf: bool
+
+
+def build_dispatch_table():
+    """
+    Map (DocType, doc_events method) to the enabled rules for it, oldest first.
+    """
+    table = {}
+    for row in frappe.get_all(
+        "WhatsApp Event Rule",
+        filters={"enabled": 1},
+        fields=[
+            "name", "modified", "document_type", "event", "party_type", "party_type_field", "party_field",
+            "phone_source", "phone_field", "template", "condition", "attach_pdf",
+        ],
+        order_by="creation asc",
+    ):
+        event = EVENTS.get(row.event)
+        if not event:
+            continue
+        table.setdefault((row.document_type, event), []).append(EventRule(
+            name=row.name,
+            version=str(row.modified),
+            document_type=row.document_type,
+            event=event,
+            party_type=row.party_type or None,
+            party_type_field=row.party_type_field or None,
+            party_field=row.party_field or None,
+            phone_source=row.phone_source or PHONE_FROM_PARTY,
+            phone_field=row.phone_field or None,
+            template=(row.template or "").strip() or None,
+            condition=(row.condition or "").strip() or None,
+            attach_pdf=bool(row.attach_pdf),
+        ))
+    return {key: tuple(rules) for key, rules in table.items()}
+
+
+def get_dispatch_table():
+    """
+    Return the rule dispatch table without touching the database on the hot path:
+    memoized on frappe.local for the current request/job, shared across workers in Redis.
+    """
+    table = getattr(frappe.local, "wassenger_event_rules", None)
+    if table is not None:
+        return table
+
+    table = frappe.cache().get_value(EVENT_RULES_CACHE_KEY)
+    if table is None:
+        table = build_dispatch_table()
+        frappe.cache().set_value(EVENT_RULES_CACHE_KEY, table)
+
+    frappe.local.wassenger_event_rules = table
+    return table
+
+
+def clear_event_rules_cache(*args, **kwargs):
+    """
+    Drop the dispatch table; called when a WhatsApp Event Rule is saved or deleted.
+    """
+    frappe.cache().delete_value(EVENT_RULES_CACHE_KEY)
+    frappe.local.wassenger_event_rules = None
+
+
+def handle_doc_event(doc, method=None):
+    """
+    doc_events hook for every DocType ("*"): queue a WhatsApp message for each enabled
+    WhatsApp Event Rule of this DocType and event.
+    Documents without a rule cost one dictionary lookup. Skipped while installing or migrating,
+    when the rules table may not exist yet.
+    """
+    if frappe.flags.in_install or frappe.flags.in_migrate or frappe.flags.in_patch:
+        return
+
+    rules = get_dispatch_table().get((doc.doctype, method))
+    if not rules:
+        return
+
+    for rule in rules:
+        queue_rule_message(doc, rule)
+
+
+def queue_rule_message(doc, rule):
+    """
+    Create the WH Massage a rule asks for:
+    - Skipped if the rule's condition is false for the document.
+    - The party comes from the rule (fixed party type, or read from a field like Payment
+      Entry's `party_type`); the number from the party (cached, see `phone.resolve_party_phone`),
+      a field of the document, or the party falling back to the field.
+    - Do not send the WhatsApp message, only insert the record; the outbound queue sends it
+      in the background once the document's transaction commits.
+    """
+    if rule.condition and not frappe.safe_eval(rule.condition, None, {"doc": doc, "nowdate": frappe.utils.nowdate}):
+        return
+
+    settings = get_settings()
+    party_type = doc.get(rule.party_type_field) if rule.party_type_field else rule.party_type
+    party = doc.get(rule.party_field) if rule.party_field else None
+
+    whatsapp_number = None
+    if rule.phone_source in (PHONE_FROM_PARTY, PHONE_FROM_PARTY_THEN_FIELD):
+        whatsapp_number = resolve_party_phone(party_type, party)
+    if not whatsapp_number and rule.phone_source in (PHONE_FROM_FIELD, PHONE_FROM_PARTY_THEN_FIELD):
+        whatsapp_number = doc.get(rule.phone_field) if rule.phone_field else None
+
+    if not whatsapp_number:
+        frappe.log_error(f"No WhatsApp number found for {party_type} in {doc.doctype} {doc.name}")
+        return
+
+    message = render_rule_message(doc, rule, party_type)
+
+    # The PDF, if allowed, is rendered once in a background worker (see attachments.py)
+    send_file = rule.attach_pdf and settings.allow_send_pdf_attachment
+
+    # --- Create and submit WH Massage record in a single insert ---
+    frappe.get_doc({
+        "doctype": "WH Massage",
+        "docstatus": 1,
+        "reference_doctype": doc.doctype,
+        "reference_name": doc.name,
+        "party_type": party_type,
+        "party": party,
+        "phone": whatsapp_number,
+        "send_message": message,
+        "attachment_pending": 1 if send_file else 0,
+        "type": "out",
+    }).insert(ignore_permissions=True)
+
+    if send_file:
+        enqueue_document_pdf(doc.doctype, doc.name)
+
+
+def render_rule_message(doc, rule, party_type):
+    """
+    Render the rule's own template, or else the DocType's WhatsApp Message Template (or the
+    built-in default), compiling each only when it changed since last use.
+    """
+    with timed("render"):
+        if not rule.template:
+            template, fields = get_compiled_template(doc.doctype)
+        else:
+            compiled = _compiled_templates.get(rule.name)
+            if not compiled or compiled[0] != rule.version:
+                compiled = _compiled_templates[rule.name] = (rule.version, *compile_template(rule.template))
+            template, fields = compiled[1], compiled[2]
+        return render_template(template, fields, doc, doc.doctype, party_type)
@@ -0,0 +1,136 @@
+import hashlib
+from urllib.parse import parse_qs, urlparse
+
+import frappe
+from frappe.utils import add_to_date, get_datetime, now_datetime
+
+FILE_CACHE_PREFIX = "wassenger_file_id"
+
+
+def get_file_cache_keys(file_urls):
+    """
+    Return a stable key per attachment URL so the same content maps to the same Wassenger file:
+    - Files stored in Frappe are keyed by their content hash (looked up in one query).
+    - Print-format PDF URLs are keyed by document, print format and letterhead flag
+      (submitted documents do not change, so neither does their PDF).
+    - Anything else is keyed by its URL.
+    Returns {file_url: (cache_key, content_hash)}.
+    """
+    parsed_urls = {file_url: urlparse(file_url) for file_url in set(file_urls)}
+    local_paths = [
+        parsed.path for parsed in parsed_urls.values()
+        if parsed.path.startswith(("/files/", "/private/files/"))
+    ]
+    content_hashes = {}
+    if local_paths:
+        content_hashes = dict(frappe.get_all(
+            "File",
+            filters={"file_url": ["in", local_paths], "content_hash": ["is", "set"]},
+            fields=["file_url", "content_hash"],
+            as_list=True,
+        ))
+
+    keys = {}
+    for file_url, parsed in parsed_urls.items():
+        content_hash = content_hashes.get(parsed.path)
+        if content_hash:
+            source = f"content:{content_hash}"
+        elif parsed.path.endswith("frappe.utils.print_format.download_pdf"):
+            query = parse_qs(parsed.query)
+            source = "print:" + ":".join(
+                (query.get(param) or [""])[0] for param in ("doctype", "name", "format", "no_letterhead")
+            )
+        else:
+            source = f"url:{file_url}"
+        keys[file_url] = (hashlib.sha1(source.encode()).hexdigest(), content_hash)
+
+    return keys
+
+
+def get_account_file_cache_key(cache_key, api_key):
+    """
+    Key of the same attachment uploaded with another Wassenger API key (e.g. a device with
+    its own account), whose file IDs are not valid for the main account and vice versa.
+    """
+    return hashlib.sha1(f"{cache_key}:{api_key}".encode()).hexdigest()
+
+
+def get_cached_file_ids(cache_keys):
+    """
+    Look up Wassenger file IDs for many cache keys at once.
+    Redis is checked first; misses fall back to the Wassenger File Cache table in one query
+    and are written back to Redis for the rest of their lifetime.
+    """
+    cache = frappe.cache()
+    found = {}
+    for key in set(cache_keys):
+        file_id = cache.get_value(f"{FILE_CACHE_PREFIX}:{key}")
+        if file_id:
+            found[key] = file_id
+
+    missing = [key for key in set(cache_keys) if key not in found]
+    if missing:
+        now = now_datetime()
+        rows = frappe.get_all(
+            "Wassenger File Cache",
+            filters={"name": ["in", missing], "expires_on": [">", now]},
+            fields=["name", "file_id", "expires_on"],
+        )
+        for row in rows:
+            found[row.name] = row.file_id
+            expires_in = int((get_datetime(row.expires_on) - now).total_seconds())
+            cache.set_value(f"{FILE_CACHE_PREFIX}:{row.name}", row.file_id, expires_in_sec=expires_in)
+
+    return found
+
+
+def cache_file_ids(entries, ttl_days):
+    """
+    Remember newly uploaded files. `entries` maps cache_key to a dict with
+    file_id, file_url and content_hash.
+    """
+    if not entries:
+        return
+
+    cache = frappe.cache()
+    now = now_datetime()
+    expires_on = add_to_date(now, days=ttl_days)
+    user = frappe.session.user
+
+    values = []
+    for key, entry in entries.items():
+        cache.set_value(f"{FILE_CACHE_PREFIX}:{key}", entry["file_id"], expires_in_sec=ttl_days * 24 * 60 * 60)
+        values.append((
+            key, key, entry["file_id"], entry.get("file_url"), entry.get("content_hash"),
+            expires_on, now, now, user, user,
+        ))
+
+    frappe.db.bulk_insert(
+        "Wassenger File Cache",
+        fields=[
+            "name", "cache_key", "file_id", "file_url", "content_hash",
+            "expires_on", "creation", "modified", "owner", "modified_by",
+        ],
+        values=values,
+        ignore_duplicates=True,
+    )
+
+
+def invalidate_file_ids(cache_keys):
+    """
+    Forget cached file IDs, e.g. when Wassenger no longer accepts them.
+    """
+    if not cache_keys:
+        return
+
+    cache = frappe.cache()
+    for key in cache_keys:
+        cache.delete_value(f"{FILE_CACHE_PREFIX}:{key}")
+    frappe.db.delete("Wassenger File Cache", {"name": ["in", list(cache_keys)]})
+
+
+def clear_expired_file_ids():
+    """
+    Daily: drop expired rows from the persistent table (Redis entries expire on their own).
+    """
+    frappe.db.delete("Wassenger File Cache", {"expires_on": ["<", now_datetime()]})
@@ -11,17 +11,25 @@ app_license = "mit"
 # required_apps = []
 
 doc_events = {
-    "Sales Invoice": {
-        "on_submit": "wassenger_integration.send_on_submit.send_document_whatsapp_on_submit"
+    # WhatsApp Event Rules: one lookup in the cached dispatch table (see event_rules.py)
+    "*": {
+        "after_insert": "wassenger_integration.event_rules.handle_doc_event",
+        "on_update": "wassenger_integration.event_rules.handle_doc_event",
+        "on_submit": "wassenger_integration.event_rules.handle_doc_event",
+        "on_cancel": "wassenger_integration.event_rules.handle_doc_event"
     },
-    "Purchase Invoice": {
-        "on_submit": "wassenger_integration.send_on_submit.send_document_whatsapp_on_submit"
+    "Global Defaults": {
+        "on_update": "wassenger_integration.settings.clear_settings_cache"
     },
-    "Delivery Note": {
-        "on_submit": "wassenger_integration.send_on_submit.send_document_whatsapp_on_submit"
+    "Customer": {
+        "on_update": "wassenger_integration.phone.clear_party_phone_cache"
     },
-    "Payment Entry": {
-        "on_submit": "wassenger_integration.send_on_submit.send_document_whatsapp_on_submit"
+    "Supplier": {
+        "on_update": "wassenger_integration.phone.clear_party_phone_cache"
+    },
+    "Contact": {
+        "on_update": "wassenger_integration.phone.clear_party_phone_cache",
+        "on_trash": "wassenger_integration.phone.clear_party_phone_cache"
     }
 }
 
@@ -163,6 +171,20 @@ doc_events = {
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+    "all": [
+        "wassenger_integration.outbound.enqueue_outbound_queue",
+        "wassenger_integration.webhooks.apply_webhook_events",
+        "wassenger_integration.campaigns.enqueue_due_campaigns"
+    ],
+    "daily": [
+        "wassenger_integration.file_cache.clear_expired_file_ids"
+    ],
+    "daily_long": [
+        "wassenger_integration.archive.archive_messages"
+    ]
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"wassenger_integration.tasks.all"
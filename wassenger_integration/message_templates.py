@@ -0,0 +1,186 @@
+import frappe
+from frappe.utils import fmt_money, formatdate
+from jinja2 import meta
+
+from wassenger_integration.settings import get_settings
+
+TEMPLATE_CACHE_KEY = "wassenger_message_template"
+GENERIC_TEMPLATE = "*"
+
+# Built-in texts, used for any DocType without an enabled WhatsApp Message Template
+DEFAULT_TEMPLATES = {
+    "Sales Invoice": """Dear {{ customer_name or party_type }},
+
+Your Sales Invoice *{{ name }}* has been submitted.
+{{ line("Date", formatdate(posting_date)) }}
+{{ line("Amount", fmt_money(grand_total, currency=currency)) }}
+{{ line("Due Date", formatdate(due_date) if due_date else None) }}
+{{ line("Customer", customer) }}
+{{ line("Contact", contact_display or contact_person) }}
+{{ line("Billing Address", customer_address) }}
+
+Thank you for your business!
+
+Best regards,
+{{ company }}""",
+    "Purchase Invoice": """Dear {{ supplier_name or party_type }},
+
+Your Purchase Invoice *{{ name }}* has been recorded.
+{{ line("Date", formatdate(posting_date)) }}
+{{ line("Amount", fmt_money(grand_total, currency=currency)) }}
+{{ line("Due Date", formatdate(due_date) if due_date else None) }}
+{{ line("Supplier", supplier) }}
+{{ line("Contact", contact_display or contact_person) }}
+{{ line("Billing Address", supplier_address) }}
+
+Thank you for your cooperation.
+
+Best regards,
+{{ company }}""",
+    "Delivery Note": """Dear {{ customer_name or party_type }},
+
+Your Delivery Note *{{ name }}* has been submitted.
+{{ line("Date", formatdate(posting_date)) }}
+{{ line("Total Quantity", total_qty) }}
+{{ line("Customer", customer) }}
+{{ line("Contact", contact_display or contact_person) }}
+{{ line("Delivery Address", customer_address) }}
+
+Thank you for choosing us.
+
+Best regards,
+{{ company }}""",
+    "Payment Entry": """Dear {{ party or party_type }},
+
+A Payment Entry *{{ name }}* has been submitted.
+{{ line("Date", formatdate(posting_date)) }}
+{{ line("Amount", fmt_money(paid_amount, currency=paid_to_account_currency or party_account_currency or "")) }}
+{{ line("Party", party) }}
+{{ line("Reference", reference_no) }}
+
+Best regards,
+{{ company }}""",
+    GENERIC_TEMPLATE: """Dear {{ party_type }},
+
+Your {{ doctype }} *{{ name }}* has been submitted.
+
+Best regards,
+{{ company }}""",
+}
+
+
+# Default text of WhatsApp Campaigns reminding customers of overdue Sales Invoices
+PAYMENT_REMINDER_TEMPLATE = """Dear {{ customer_name or customer }},
+
+This is a friendly reminder that Sales Invoice *{{ name }}* is overdue.
+{{ line("Due Date", formatdate(due_date)) }}
+{{ line("Days Overdue", days_overdue) }}
+{{ line("Outstanding Amount", fmt_money(outstanding_amount, currency=currency)) }}
+
+Please arrange the payment at your earliest convenience. If you have already paid, kindly ignore this message.
+
+Best regards,
+{{ company }}"""
+
+
+def line(label, value):
+    """
+    "Label: value" if the value is meaningful, otherwise an empty line (dropped after rendering).
+    """
+    if value and str(value).strip() and str(value).strip().lower() != "none":
+        return f"{label}: {value}"
+    return ""
+
+
+TEMPLATE_GLOBALS = {"line": line, "formatdate": formatdate, "fmt_money": fmt_money}
+# Always put in the context by `render_message`, never read from the document
+CONTEXT_NAMES = {"name", "doctype", "company", "party_type"}
+
+# Per-worker cache of compiled templates: {doctype: (version, template, fields)}
+_compiled_templates = {}
+
+
+def get_template_source(doctype):
+    """
+    Return (version, source) of the template for a DocType, read through Redis so a render
+    never queries the database. The version changes whenever the template is edited.
+    """
+    cache = frappe.cache()
+    cached = cache.hget(TEMPLATE_CACHE_KEY, doctype)
+    if cached is None:
+        row = frappe.db.get_value(
+            "WhatsApp Message Template", {"name": doctype, "enabled": 1}, ["modified", "template"], as_dict=True
+        )
+        cached = (str(row.modified), row.template) if row else ("", "")
+        cache.hset(TEMPLATE_CACHE_KEY, doctype, cached)
+
+    version, source = cached
+    if not source:
+        source = DEFAULT_TEMPLATES.get(doctype) or DEFAULT_TEMPLATES[GENERIC_TEMPLATE]
+    return version, source
+
+
+def compile_template(source):
+    """
+    Compile a template once and work out which document fields it reads, so rendering
+    only needs that projection of the document.
+    """
+    jenv = frappe.get_jenv()
+    fields = sorted(meta.find_undeclared_variables(jenv.parse(source)) - set(TEMPLATE_GLOBALS) - CONTEXT_NAMES)
+    return jenv.from_string(source, globals=TEMPLATE_GLOBALS), fields
+
+
+def get_compiled_template(doctype):
+    """
+    Return (template, fields) for a DocType, compiling it only when it changed since last use.
+    """
+    version, source = get_template_source(doctype)
+    compiled = _compiled_templates.get(doctype)
+    if not compiled or compiled[0] != version:
+        template, fields = compile_template(source)
+        compiled = _compiled_templates[doctype] = (version, template, fields)
+    return compiled[1], compiled[2]
+
+
+def get_template_fields(doctype):
+    """
+    Document fields the DocType's template reads, e.g. to fetch many documents in one query.
+    """
+    return get_compiled_template(doctype)[1]
+
+
+def render_message(doctype, values, party_type=None):
+    """
+    Render the WhatsApp text for one document from `values`, a document or any dict holding
+    (at least) the fields from `get_template_fields`.
+    Empty lines and lines rendered as "None" are dropped.
+    """
+    template, fields = get_compiled_template(doctype)
+    return render_template(template, fields, values, doctype, party_type)
+
+
+def render_template(template, fields, values, doctype=None, party_type=None):
+    """
+    Render a template compiled with `compile_template` from `values`; see `render_message`.
+    """
+    context = {field: values.get(field) for field in fields}
+    context.update({
+        "name": values.get("name"),
+        "doctype": doctype,
+        "company": values.get("company") or get_settings().default_company,
+        "party_type": party_type,
+    })
+    text = template.render(context)
+    return "\n".join(
+        line for line in text.splitlines() if line.strip() and line.strip().lower() != "none"
+    )
+
+
+def clear_template_cache(doctype=None):
+    """
+    Forget the cached source for one DocType (or all); workers recompile on their next render.
+    """
+    if doctype:
+        frappe.cache().hdel(TEMPLATE_CACHE_KEY, doctype)
+    else:
+        frappe.cache().delete_value(TEMPLATE_CACHE_KEY)
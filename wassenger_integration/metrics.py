@@ -0,0 +1,182 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import frappe
+
+METRICS_PREFIX = "wassenger_metrics"
+METRICS_RETENTION_HOURS = 7 * 24
+# Stages of the send path timed by `timed`, in the order a message goes through them
+STAGES = (
+    "settings_load",
+    "render",
+    "pdf_render",
+    "rate_limit_wait",
+    "upload",
+    "post",
+    "db_write",
+    "webhook_apply",
+)
+# Histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+@contextmanager
+def timed(stage, samples=None):
+    """
+    Time the wrapped block as one sample of `stage`.
+    With a `samples` list the sample is only appended to it (safe in dispatch threads, which
+    must not touch Redis through frappe); the caller records the list later with
+    `record_samples`. Without one it is recorded right away.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample = (stage, time.perf_counter() - start)
+        if samples is None:
+            record_samples([sample])
+        else:
+            samples.append(sample)
+
+
+def get_bucket(milliseconds):
+    for bound in BUCKETS_MS:
+        if milliseconds <= bound:
+            return str(bound)
+    return "inf"
+
+
+def get_metrics_key(stage, hour):
+    return frappe.cache().make_key(f"{METRICS_PREFIX}:{stage}:{hour}")
+
+
+def record_samples(samples):
+    """
+    Add `(stage, seconds)` samples to the hourly histograms in Redis, aggregated first so a
+    batch of any size costs one pipeline with a few commands per stage.
+    Metrics are best effort: failures are logged, never raised into the send path.
+    """
+    if not samples:
+        return
+
+    counts = Counter()
+    totals = Counter()
+    for stage, seconds in samples:
+        milliseconds = seconds * 1000
+        counts[(stage, get_bucket(milliseconds))] += 1
+        counts[(stage, "count")] += 1
+        totals[stage] += milliseconds
+
+    hour = int(time.time() // 3600)
+    try:
+        pipeline = frappe.cache().pipeline()
+        for (stage, field), count in counts.items():
+            pipeline.hincrby(get_metrics_key(stage, hour), field, count)
+        for stage, total in totals.items():
+            key = get_metrics_key(stage, hour)
+            pipeline.hincrbyfloat(key, "sum", total)
+            pipeline.expire(key, METRICS_RETENTION_HOURS * 3600)
+        pipeline.execute()
+    except Exception:
+        frappe.log_error("Error recording Wassenger metrics")
+
+
+def get_stage_histograms(hours=1):
+    """
+    Merge the hourly histograms of the last `hours` hours: {stage: {field: value}}.
+    """
+    current_hour = int(time.time() // 3600)
+    keys = [(stage, get_metrics_key(stage, hour)) for stage in STAGES for hour in range(current_hour - hours + 1, current_hour + 1)]
+
+    # Raw pipeline: the cache wrapper's hgetall expects pickled values
+    pipeline = frappe.cache().pipeline()
+    for _, key in keys:
+        pipeline.hgetall(key)
+
+    histograms = {stage: Counter() for stage in STAGES}
+    for (stage, _), values in zip(keys, pipeline.execute(), strict=True):
+        for field, value in values.items():
+            histograms[stage][frappe.safe_decode(field)] += float(value)
+    return histograms
+
+
+def get_percentile(histogram, percentile):
+    """
+    Estimate a percentile (ms) from bucket counts, interpolating inside the bucket.
+    Samples slower than the last bound count as that bound; an empty histogram gives None.
+    """
+    if not histogram["count"]:
+        return None
+    rank = histogram["count"] * percentile / 100
+    seen = 0
+    lower = 0
+    for bound in BUCKETS_MS:
+        count = histogram[str(bound)]
+        if count and seen + count >= rank:
+            return round(lower + (bound - lower) * (rank - seen) / count, 1)
+        seen += count
+        lower = bound
+    return float(BUCKETS_MS[-1])
+
+
+def get_stage_summary(hours=1):
+    """
+    {stage: {count, avg_ms, p50_ms, p90_ms, p99_ms}} over the last `hours` hours.
+    """
+    summary = {}
+    for stage, histogram in get_stage_histograms(hours).items():
+        count = int(histogram["count"])
+        summary[stage] = {
+            "count": count,
+            "avg_ms": round(histogram["sum"] / count, 1) if count else None,
+            "p50_ms": get_percentile(histogram, 50),
+            "p90_ms": get_percentile(histogram, 90),
+            "p99_ms": get_percentile(histogram, 99),
+        }
+    return summary
+
+
+def get_queue_stats(hours=1):
+    """
+    Outbound backlog (Pending, Retrying, waiting for a PDF, due now) plus message counts per
+    status and direction created in the last `hours` hours, and the buffered webhook events.
+    """
+    from wassenger_integration.webhooks import WEBHOOK_BUFFER_KEY
+
+    backlog = frappe.db.sql(
+        """
+        select
+            count(*) as queued,
+            coalesce(sum(status = 'Retrying'), 0) as retrying,
+            coalesce(sum(attachment_pending = 1), 0) as waiting_for_pdf,
+            coalesce(sum(attachment_pending = 0 and coalesce(next_attempt_at, '2000-01-01') <= %(now)s), 0) as due
+        from `tabWH Massage`
+        where type = 'out' and docstatus = 1 and status in ('Pending', 'Retrying')
+        """,
+        {"now": frappe.utils.now()},
+        as_dict=True,
+    )[0]
+
+    since = frappe.utils.add_to_date(frappe.utils.now_datetime(), hours=-hours)
+    status_counts = {}
+    for row in frappe.get_all(
+        "WH Massage",
+        filters={"creation": [">=", since]},
+        fields=["type", "status", "count(name) as count"],
+        group_by="type, status",
+    ):
+        status_counts.setdefault(row.type or "out", {})[row.status or "Draft"] = row.count
+
+    return {
+        "queue_depth": {field: frappe.utils.cint(value) for field, value in backlog.items()},
+        "status_counts": status_counts,
+        "webhook_buffer": frappe.cache().llen(WEBHOOK_BUFFER_KEY),
+    }
+
+
+def get_post_latency_card(filters=None):
+    """
+    Number card: 90th percentile of Wassenger message POSTs over the last hour, in ms.
+    """
+    return {"value": get_stage_summary(1)["post"]["p90_ms"] or 0, "fieldtype": "Float"}
@@ -0,0 +1,353 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+
+from wassenger_integration.dedup import claim_messages, get_dedup_key, release_messages
+from wassenger_integration.phone import normalize_phone
+from wassenger_integration.wassenger_integration.doctype.wh_massage.wh_massage import is_valid_whatsapp_number
+
+OUTBOUND_QUEUE_JOB_ID = "wassenger_outbound_queue"
+# A run stops starting batches after MAX_RUN_SECONDS; the margin covers its last (paced) batch
+OUTBOUND_QUEUE_TIMEOUT = 30 * 60
+MAX_RUN_SECONDS = 20 * 60
+# Longest a run sleeps for a rate-limit slot, or waits to resume; later ones are left to the scheduler
+MAX_DEFER_WAIT_SECONDS = 4 * 60
+OUTBOUND_QUEUE_LOCK = "wassenger_outbound_queue_lock"
+# Renewed after every batch, so it only has to outlive one paced batch, not a whole run
+OUTBOUND_QUEUE_LOCK_TIMEOUT = 15 * 60
+BATCH_SIZE = 50
+MAX_BATCHES_PER_RUN = 20
+MAX_RETRY_DELAY_SECONDS = 6 * 60 * 60
+INSERT_CHUNK_SIZE = 500
+OUTBOUND_MESSAGE_FIELDS = (
+    "phone", "send_message", "file", "reference_doctype", "reference_name", "party_type", "party", "campaign",
+)
+
+
+def enqueue_outbound_queue():
+    """
+    Schedule a background drain of the outbound queue once the current transaction commits.
+    Repeated calls while a drain is already queued collapse into a single job.
+    Also run by the scheduler, so the drain (which can take many minutes) runs in a long-queue
+    worker with a timeout sized for it rather than in the scheduled job itself.
+    """
+    frappe.enqueue(
+        "wassenger_integration.outbound.process_outbound_queue",
+        queue="long",
+        timeout=OUTBOUND_QUEUE_TIMEOUT,
+        job_id=OUTBOUND_QUEUE_JOB_ID,
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def resume_outbound_queue(delay):
+    """
+    Enqueue a follow-up drain in `delay` seconds, for a run that stopped with messages left.
+    Not deduplicated: the run enqueueing it still holds the job ID of the outbound queue.
+    """
+    frappe.enqueue(
+        "wassenger_integration.outbound.process_outbound_queue",
+        queue="long",
+        timeout=OUTBOUND_QUEUE_TIMEOUT + delay,
+        enqueue_after_commit=True,
+        delay=delay,
+    )
+
+
+def get_retry_delay(attempts, settings):
+    """
+    Seconds to wait before attempt number `attempts + 1`: exponential backoff from
+    `retry_backoff_seconds`, capped at six hours, with jitter so retries of a burst
+    of failures do not all hit Wassenger in the same second.
+    """
+    delay = min(settings.retry_backoff_seconds * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+    return random.uniform(delay / 2, delay)
+
+
+def get_pending_messages(limit=BATCH_SIZE, filters=None):
+    """
+    Return submitted outbound WH Massage rows due for (re)sending, oldest first, in one query.
+    `filters` narrows the selection further (e.g. to one campaign).
+    Rows whose PDF is still being rendered are skipped until it is attached.
+    Rows without a next attempt time are due immediately (Frappe compares NULL datetimes
+    as 0001-01-01).
+    """
+    return frappe.get_all(
+        "WH Massage",
+        filters={
+            "type": "out",
+            "status": ["in", ["Pending", "Retrying"]],
+            "docstatus": 1,
+            "attachment_pending": 0,
+            "next_attempt_at": ["<=", frappe.utils.now_datetime()],
+            **(filters or {}),
+        },
+        fields=[
+            "name", "owner", "phone", "send_message", "file", "attempts", "dedup_key", "wassenger_message_id",
+            "party_type", "party", "reference_doctype", "reference_name",
+        ],
+        order_by="creation asc",
+        limit=limit,
+    )
+
+
+def insert_outbound_messages(messages, settings, is_digest=False, caller=None):
+    """
+    Validate many outbound messages at once and store the valid ones as submitted, Pending
+    WH Massage rows with multi-row INSERTs, skipping the per-document insert/submit path.
+    Each message is a dict with `phone` and `message` and optionally `file`,
+    `reference_doctype`, `reference_name`, `party_type`, `party` and `campaign`.
+    Returns `(names, errors)`: the new row name per accepted message (None if rejected) and
+    `{"index", "error"}` entries for rejected ones. The caller enqueues the outbound queue.
+    With a coalescing window configured, messages are held for that long so later ones for
+    the same phone can join a digest (see `digests.coalesce_pending_messages`); digests
+    themselves (`is_digest`) are due right away and keep the `owner` of the messages they fold.
+    Links (reference, party, campaign) must point at existing documents, checked with one
+    query per DocType. With a `caller` (the user of an API request), files they cannot read
+    are rejected.
+    """
+    readable_files = None
+    if caller:
+        from wassenger_integration.api import get_readable_file_urls
+
+        readable_files = get_readable_file_urls(
+            {message["file"] for message in messages if isinstance(message, dict) and message.get("file")}, caller
+        )
+
+    now = frappe.utils.now()
+    next_attempt_at = None if is_digest else get_coalescing_hold(settings)
+    user = frappe.session.user
+    names = []
+    errors = []
+    accepted = []
+    for index, message in enumerate(messages):
+        names.append(None)
+        if not isinstance(message, dict):
+            errors.append({"index": index, "error": "Each message must be an object."})
+            continue
+
+        values = {field: message.get(field) or None for field in OUTBOUND_MESSAGE_FIELDS}
+        values["send_message"] = message.get("message") or message.get("send_message")
+        values["phone"] = normalize_phone(values["phone"], settings.default_country_code) or values["phone"]
+        if not is_valid_whatsapp_number(values["phone"]):
+            error = "Phone number is missing, not valid, or does not include country code."
+        elif not values["send_message"] and not values["file"]:
+            error = "Nothing to send: provide a message or a file."
+        elif values["file"] and readable_files is not None and values["file"] not in readable_files:
+            error = "File not found or not permitted."
+        else:
+            accepted.append((index, message, values))
+            continue
+        errors.append({"index": index, "error": error})
+
+    existing_links = get_existing_links(
+        link for _, _, values in accepted for _, *link in get_message_links(values)
+    )
+    rows = []
+    for index, message, values in accepted:
+        missing = [
+            f"{frappe.unscrub(field)} {name} not found."
+            for field, doctype, name in get_message_links(values)
+            if (doctype, name) not in existing_links
+        ]
+        if missing:
+            errors.append({"index": index, "error": missing[0]})
+            continue
+
+        name = names[index] = frappe.generate_hash(length=10)
+        owner = (is_digest and message.get("owner")) or user
+        dedup_key = get_dedup_key(
+            values["reference_doctype"], values["reference_name"], values["phone"], values["send_message"]
+        )
+        rows.append((
+            name, now, now, owner, user, 1, "out", "Pending", 0, 0, next_attempt_at, int(is_digest), dedup_key,
+            *(values[field] for field in OUTBOUND_MESSAGE_FIELDS),
+        ))
+    errors.sort(key=lambda error: error["index"])
+
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        frappe.db.bulk_insert(
+            "WH Massage",
+            fields=[
+                "name", "creation", "modified", "owner", "modified_by", "docstatus",
+                "type", "status", "attempts", "attachment_pending", "next_attempt_at", "is_digest", "dedup_key",
+                *OUTBOUND_MESSAGE_FIELDS,
+            ],
+            values=rows[start:start + INSERT_CHUNK_SIZE],
+        )
+
+    return names, errors
+
+
+def get_message_links(values):
+    """
+    `(field, DocType, name)` of each document an outbound message links to.
+    """
+    return [
+        (field, doctype, values[field])
+        for field, doctype in (
+            ("reference_doctype", "DocType"),
+            ("party_type", "DocType"),
+            ("reference_name", values["reference_doctype"]),
+            ("party", values["party_type"]),
+            ("campaign", "WhatsApp Campaign"),
+        )
+        if values[field]
+    ]
+
+
+def get_existing_links(links):
+    """
+    The `(DocType, name)` pairs among `links` that exist, with one query per DocType.
+    Links to DocTypes that do not exist, or have no table (single and virtual ones), do not.
+    """
+    names_by_doctype = {}
+    for doctype, name in links:
+        if doctype:
+            names_by_doctype.setdefault(doctype, set()).add(name)
+    if not names_by_doctype:
+        return set()
+
+    doctypes = frappe.get_all(
+        "DocType",
+        filters={"name": ["in", list(names_by_doctype.keys() | names_by_doctype.get("DocType", set()))]},
+        fields=["name", "issingle", "is_virtual"],
+    )
+    existing = {("DocType", doctype.name) for doctype in doctypes}
+    for doctype in doctypes:
+        names = names_by_doctype.get(doctype.name)
+        if names and doctype.name != "DocType" and not doctype.issingle and not doctype.is_virtual:
+            existing.update(
+                (doctype.name, name)
+                for name in frappe.get_all(doctype.name, filters={"name": ["in", list(names)]}, pluck="name")
+            )
+    return existing
+
+
+def get_coalescing_hold(settings):
+    """
+    When a new outbound message becomes due if a coalescing window is set, otherwise None (now).
+    """
+    if not settings.coalesce_window_minutes:
+        return None
+    return frappe.utils.add_to_date(frappe.utils.now_datetime(), minutes=settings.coalesce_window_minutes)
+
+
+def process_outbound_queue(batch_size=BATCH_SIZE, max_batches=MAX_BATCHES_PER_RUN, delay=0):
+    """
+    Drain pending outbound WH Massage rows in batches.
+    Enqueued after a WH Massage is submitted and on every scheduler tick, which is also what
+    picks up Retrying rows once their backoff has elapsed.
+    A run that stops with messages left (out of time, or waiting for a rate-limit slot) enqueues
+    the next one to start when they can be sent, after `delay` seconds.
+    """
+    if delay:
+        time.sleep(delay)
+    summary = send_pending_messages(
+        limit=batch_size * max_batches, batch_size=batch_size, max_seconds=MAX_RUN_SECONDS
+    )
+    if summary and summary["resume_in"] is not None and summary["resume_in"] <= MAX_DEFER_WAIT_SECONDS:
+        resume_outbound_queue(summary["resume_in"])
+
+
+def send_pending_messages(limit, concurrency=None, batch_size=BATCH_SIZE, filters=None, max_seconds=None):
+    """
+    Send up to `limit` pending messages, `concurrency` HTTP calls at a time.
+    - Each batch is fetched in one query, delivered over a bounded thread pool and written
+      back with batched updates, then committed.
+    - Sends are paced by the shared rate limiter of the device each message is routed to
+      (or of the API key when no devices are configured). Messages that hit the limit stay
+      Pending until their next slot, while those routed to other devices keep being sent.
+    - Each message is claimed before it is sent (see `dedup.claim_messages`), so duplicates of an
+      already sent message are marked Duplicate instead of being sent again.
+    - Only one run sends at a time per site. The lock is renewed after each batch, however long
+      the (paced) run takes.
+    - `filters` restricts the run to matching messages (see `get_pending_messages`).
+    - With `max_seconds`, no batch is started after that long, so a run ends within the timeout
+      of its job instead of being killed with sent messages not yet saved. Such a run also sleeps
+      for a rate-limit slot that comes up soon once every device is waiting for one; other runs
+      stop there.
+    Returns None if another run holds the lock, otherwise a summary of how many messages were
+    sent, failed, deferred or skipped, and `resume_in`: seconds until the messages left can be
+    sent, or None if there are none.
+    """
+    from wassenger_integration.api import (
+        deliver_message,
+        get_wassenger_settings,
+        prepare_messages,
+        save_delivery_results,
+    )
+    from wassenger_integration.digests import coalesce_pending_messages
+    from wassenger_integration.rate_limit import get_rate_limiter
+
+    cache = frappe.cache()
+    lock = cache.lock(cache.make_key(OUTBOUND_QUEUE_LOCK), timeout=OUTBOUND_QUEUE_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return None
+
+    summary = {"sent": 0, "failed": 0, "deferred": 0, "skipped": 0, "resume_in": None}
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    try:
+        settings = get_wassenger_settings()
+        concurrency = concurrency or settings.send_concurrency
+        if settings.coalesce_window_minutes:
+            coalesce_pending_messages(settings, filters)
+            frappe.db.commit()
+        limiters = {}
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # When each deferred message is due again (see `api.save_delivery_results`)
+            deferred_until = []
+            while limit > 0 and not (deadline and time.monotonic() > deadline):
+                rows = get_pending_messages(min(batch_size, limit), filters)
+                if rows:
+                    limit -= len(rows)
+
+                    messages, skipped = claim_messages(prepare_messages(rows, settings), settings)
+                    for message in messages:
+                        if message.device not in limiters:
+                            limiters[message.device] = get_rate_limiter(settings, message.device)
+                    results = list(executor.map(
+                        lambda message: deliver_message(message, settings, limiters[message.device]), messages
+                    ))
+                    save_delivery_results(results, settings)
+                    if skipped:
+                        frappe.db.bulk_update("WH Massage", skipped)
+                    frappe.db.commit()
+                    release_messages(results)
+                    summary["skipped"] += len(skipped)
+
+                    retry_after = []
+                    for result in results:
+                        if result.retry_after:
+                            summary["deferred"] += 1
+                            retry_after.append(result.retry_after)
+                        else:
+                            summary["sent" if result.status == "Sent" else "failed"] += 1
+                    deferred_until.extend(time.monotonic() + seconds for seconds in retry_after)
+
+                    lock.reacquire()
+                    # Only the messages of a limited device wait; the other devices keep sending
+                    if not retry_after or len(retry_after) < len(results):
+                        continue
+
+                # Nothing due, or every device is limited: wait for the first deferred message
+                if not deferred_until:
+                    break
+                wait = max(min(deferred_until) - time.monotonic(), 0)
+                if not deadline or wait > MAX_DEFER_WAIT_SECONDS or time.monotonic() + wait > deadline:
+                    summary["resume_in"] = wait
+                    break
+                time.sleep(wait)
+                deferred_until = [until for until in deferred_until if until > time.monotonic()]
+            else:
+                # Out of time or batches: the next run picks up whatever is left
+                summary["resume_in"] = 0
+    finally:
+        if lock.owned():
+            lock.release()
+
+    return summary
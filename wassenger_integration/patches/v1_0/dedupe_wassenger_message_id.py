@@ -0,0 +1,35 @@
+import frappe
+
+
+def execute():
+    """
+    Prepare `WH Massage.wassenger_message_id` for its unique index (added by model sync):
+    blank IDs become NULL, and when a webhook redelivery stored the same inbound message
+    more than once, only the oldest row keeps the ID.
+    """
+    if not frappe.db.has_column("WH Massage", "wassenger_message_id"):
+        return
+
+    frappe.db.sql("update `tabWH Massage` set wassenger_message_id = NULL where wassenger_message_id = ''")
+
+    duplicate_ids = frappe.db.sql(
+        """
+        select wassenger_message_id
+        from `tabWH Massage`
+        where wassenger_message_id is not null
+        group by wassenger_message_id
+        having count(*) > 1
+        """,
+        pluck=True,
+    )
+    for message_id in duplicate_ids:
+        names = frappe.get_all(
+            "WH Massage",
+            filters={"wassenger_message_id": message_id},
+            order_by="creation asc",
+            pluck="name",
+        )
+        frappe.db.sql(
+            "update `tabWH Massage` set wassenger_message_id = NULL where name in %(names)s",
+            {"names": names[1:]},
+        )
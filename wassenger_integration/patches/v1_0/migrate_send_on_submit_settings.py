@@ -0,0 +1,61 @@
+import frappe
+
+# Old Wassenger Settings checkbox -> the WhatsApp Event Rule that replaces it
+SEND_ON_SUBMIT_RULES = {
+    "send_sales_invoice_on_submit": {
+        "document_type": "Sales Invoice",
+        "party_type": "Customer",
+        "party_field": "customer",
+        "phone_source": "Party",
+    },
+    "send_purchase_invoice_on_submit": {
+        "document_type": "Purchase Invoice",
+        "party_type": "Supplier",
+        "party_field": "supplier",
+        "phone_source": "Party",
+    },
+    "send_delivery_note_on_submit": {
+        "document_type": "Delivery Note",
+        "party_type": "Customer",
+        "party_field": "customer",
+        "phone_source": "Party",
+    },
+    "send_payment_entry_on_submit": {
+        "document_type": "Payment Entry",
+        "party_type_field": "party_type",
+        "party_field": "party",
+        "phone_source": "Party",
+    },
+}
+
+
+def execute():
+    """
+    Replace the "Send WhatsApp on ... Submit" checkboxes of Wassenger Settings with WhatsApp
+    Event Rules that message the same recipients: the party's number only. (The old hook fell
+    back to the document's `mobile_no`, which these DocTypes do not have, so it never did.)
+    The fields are gone from the DocType by now, so their values are read from tabSingles.
+    """
+    enabled = frappe.db.sql(
+        """
+        select field from `tabSingles`
+        where doctype = 'Wassenger Settings' and field in %(fields)s and value = '1'
+        """,
+        {"fields": list(SEND_ON_SUBMIT_RULES)},
+        pluck=True,
+    )
+    for field in enabled:
+        rule = SEND_ON_SUBMIT_RULES[field]
+        if not frappe.db.exists("DocType", rule["document_type"]) or frappe.db.exists(
+            "WhatsApp Event Rule", {"document_type": rule["document_type"], "event": "Submit"}
+        ):
+            continue
+        try:
+            frappe.get_doc({"doctype": "WhatsApp Event Rule", "event": "Submit", **rule}).insert(ignore_permissions=True)
+        except frappe.ValidationError:
+            frappe.log_error(f"Could not create the WhatsApp Event Rule for {rule['document_type']} submit")
+
+    frappe.db.sql(
+        "delete from `tabSingles` where doctype = 'Wassenger Settings' and field in %(fields)s",
+        {"fields": list(SEND_ON_SUBMIT_RULES)},
+    )
@@ -0,0 +1,117 @@
+import re
+
+import frappe
+
+from wassenger_integration.settings import get_settings
+
+PARTY_PHONE_CACHE_KEY = "wassenger_party_phone"
+PHONE_PARTY_TYPES = ("Customer", "Supplier")
+
+
+def normalize_phone(number, default_country_code=None):
+    """
+    Normalize a phone number to E.164 (e.g. "+14155552671"), or return None if that is not possible.
+    - Spaces, dashes, dots and brackets are dropped; a "00" international prefix becomes "+".
+    - Numbers without a country code get `default_country_code` (e.g. "+20"), dropping a
+      leading trunk "0"; without a default they cannot be normalized.
+    """
+    if not number:
+        return None
+
+    number = str(number).strip()
+    has_plus = number.startswith("+")
+    digits = re.sub(r"\D", "", number)
+    if not digits:
+        return None
+
+    if not has_plus:
+        if digits.startswith("00"):
+            digits = digits[2:]
+        elif default_country_code:
+            digits = re.sub(r"\D", "", default_country_code) + digits.lstrip("0")
+        else:
+            return None
+
+    # E.164 allows at most 15 digits; anything under 8 cannot be a full international number
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+def resolve_party_phones(party_type, party_names):
+    """
+    Return {party name: WhatsApp number} for many Customers or Suppliers at once.
+    - Cached numbers come from Redis; the rest are resolved with a single query that reads the
+      party's `mobile_no` and the mobile/phone of its linked Contacts (primary contact first).
+    - Numbers are normalized to E.164 where possible. Parties without any number map to None.
+    """
+    if party_type not in PHONE_PARTY_TYPES:
+        return {name: None for name in party_names}
+
+    cache = frappe.cache()
+    phones = {}
+    missing = []
+    for name in set(party_names):
+        cached = cache.hget(PARTY_PHONE_CACHE_KEY, f"{party_type}:{name}")
+        if cached is None:
+            missing.append(name)
+        else:
+            # "" marks a party known to have no number
+            phones[name] = cached or None
+
+    if missing:
+        rows = frappe.db.sql(
+            f"""
+            select party.name, party.mobile_no, contact.mobile_no as contact_mobile, contact.phone as contact_phone
+            from `tab{party_type}` party
+            left join `tabDynamic Link` link
+                on link.link_doctype = %(party_type)s and link.link_name = party.name and link.parenttype = 'Contact'
+            left join `tabContact` contact on contact.name = link.parent
+            where party.name in %(names)s
+            order by contact.is_primary_contact desc, contact.creation asc
+            """,
+            {"party_type": party_type, "names": missing},
+            as_dict=True,
+        )
+
+        candidates = {}
+        for row in rows:
+            candidates.setdefault(row.name, [row.mobile_no]).extend([row.contact_mobile, row.contact_phone])
+
+        default_country_code = get_settings().default_country_code
+        for name in missing:
+            raw_numbers = [number for number in candidates.get(name, []) if number]
+            phone = next(
+                (normalize_phone(number, default_country_code) for number in raw_numbers
+                 if normalize_phone(number, default_country_code)),
+                # Keep the raw number so phone validation can explain what is wrong with it
+                raw_numbers[0] if raw_numbers else None,
+            )
+            phones[name] = phone
+            cache.hset(PARTY_PHONE_CACHE_KEY, f"{party_type}:{name}", phone or "")
+
+    return phones
+
+
+def resolve_party_phone(party_type, party_name):
+    if not party_type or not party_name:
+        return None
+    return resolve_party_phones(party_type, [party_name]).get(party_name)
+
+
+def clear_party_phone_cache(doc, method=None):
+    """
+    Forget cached numbers when a Customer, Supplier or Contact changes.
+    """
+    cache = frappe.cache()
+    if doc.doctype == "Contact":
+        # Include links removed in this save: their party may have used this contact's number
+        links = list(doc.get("links") or [])
+        previous = doc.get_doc_before_save() if method != "on_trash" else None
+        if previous:
+            links += previous.get("links") or []
+        for link in links:
+            if link.link_doctype in PHONE_PARTY_TYPES:
+                cache.hdel(PARTY_PHONE_CACHE_KEY, f"{link.link_doctype}:{link.link_name}")
+    else:
+        cache.hdel(PARTY_PHONE_CACHE_KEY, f"{doc.doctype}:{doc.name}")
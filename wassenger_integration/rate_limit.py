@@ -0,0 +1,127 @@
+import hashlib
+import time
+from email.utils import parsedate_to_datetime
+
+import frappe
+
+DEFAULT_RETRY_AFTER = 60
+# Longest a single send may wait for its slot before it is left Pending for a later run
+MAX_WAIT_SECONDS = 30
+
+# Tokens may go negative: every caller reserves the next free slot and sleeps until it,
+# so concurrent workers are paced instead of racing. A reservation that would have to wait
+# longer than `max_wait` (or while Wassenger told us to back off) is not taken.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'blocked_until')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+local blocked_until = tonumber(state[3]) or 0
+
+if blocked_until > now then
+    return {0, tostring(blocked_until - now)}
+end
+
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+end
+if wait > max_wait then
+    return {0, tostring(wait)}
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 3600)
+return {1, tostring(wait)}
+"""
+
+BLOCK_SCRIPT = """
+local blocked_until = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+local until_ts = tonumber(ARGV[1])
+if until_ts > blocked_until then
+    redis.call('HSET', KEYS[1], 'blocked_until', tostring(until_ts))
+    redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2])) + 3600)
+end
+return 1
+"""
+
+
+class WassengerRateLimited(Exception):
+    """Wassenger answered 429, or our own bucket has no slot soon enough."""
+
+    def __init__(self, retry_after, message=None):
+        self.retry_after = retry_after
+        super().__init__(message or f"Wassenger rate limit reached, retry after {retry_after:.0f}s")
+
+
+class TokenBucket:
+    """
+    Token bucket shared by every worker through Redis, one per API key/device.
+    Safe to use from dispatch threads: it only needs the Redis connection, not frappe.local.
+    """
+
+    def __init__(self, redis, key, rate_per_minute, burst):
+        self.key = key
+        self.rate = max(rate_per_minute, 1) / 60.0
+        self.burst = max(burst, 1)
+        self._acquire = redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._block = redis.register_script(BLOCK_SCRIPT)
+
+    def acquire(self, max_wait=MAX_WAIT_SECONDS):
+        """
+        Wait for a send slot. Raises WassengerRateLimited if none is available within `max_wait`.
+        """
+        granted, wait = self._acquire(keys=[self.key], args=[self.rate, self.burst, time.time(), max_wait])
+        wait = float(wait)
+        if not granted:
+            raise WassengerRateLimited(wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    def block(self, retry_after):
+        """
+        Stop handing out slots for `retry_after` seconds, e.g. after a 429 from Wassenger.
+        """
+        self._block(keys=[self.key], args=[time.time() + retry_after, retry_after])
+
+
+def get_retry_after(response):
+    """
+    Seconds to back off from a 429 response's Retry-After header (delta-seconds or HTTP date).
+    """
+    value = response.headers.get("retry-after")
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(float(value), 1)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 1)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+def get_rate_limiter(settings, device=None):
+    """
+    Return the shared bucket for the configured API key, or for a device (a `WassengerDevice`
+    from the settings snapshot) when routing across devices, so each number is paced by its
+    own limit. Must be called in the request/job context; the bucket can be used from threads.
+    """
+    cache = frappe.cache()
+    if device:
+        identity = f"{device.api_key}:{device.device_id}"
+        rate_per_minute, burst = device.rate_limit_per_minute, device.rate_limit_burst
+    else:
+        identity = f"{settings.api_key}:"
+        rate_per_minute, burst = settings.rate_limit_per_minute, settings.rate_limit_burst
+    return TokenBucket(
+        cache,
+        cache.make_key(f"wassenger_rate_limit:{hashlib.sha1(identity.encode()).hexdigest()[:16]}"),
+        rate_per_minute=rate_per_minute,
+        burst=burst,
+    )
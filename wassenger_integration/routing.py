@@ -0,0 +1,126 @@
+import time
+import zlib
+from collections import Counter
+
+import frappe
+
+ROUND_ROBIN_KEY = "wassenger_device_round_robin"
+DEVICE_LOAD_PREFIX = "wassenger_device_load"
+DEVICE_LOAD_TTL_SECONDS = 120
+
+
+def assign_devices(messages, settings):
+    """
+    Pick the Wassenger device each message of a batch is sent from (`message.device`),
+    according to the Device Routing policy in Wassenger Settings:
+    - A recipient with a conversation keeps the device it was last served by, so a
+      conversation stays on one WhatsApp number whatever the policy.
+    - Devices with a Company only carry messages of that company (from the referenced
+      document); other devices carry everything else.
+    - New recipients are spread by policy: "Sticky per Recipient" hashes the phone number,
+      "Round Robin" rotates through the devices (shared across workers), "Least Loaded"
+      picks the device with the most unused rate limit in the current minute.
+    Costs at most one query per referenced DocType plus one for conversations.
+    Without configured devices every message uses the main API key (`device` is None).
+    """
+    for message in messages:
+        message.device = None
+    if not settings.devices or not messages:
+        return
+
+    devices = {device.device_id: device for device in settings.devices}
+    companies = get_message_companies(messages, settings) if any(d.company for d in settings.devices) else {}
+    conversation_devices = dict(frappe.get_all(
+        "WhatsApp Conversation",
+        filters={"name": ["in", list({message.phone for message in messages})], "device": ["is", "set"]},
+        fields=["name", "device"],
+        as_list=True,
+    ))
+
+    cache = frappe.cache()
+    if settings.device_routing == "Round Robin":
+        next_index = cache.incrby(cache.make_key(ROUND_ROBIN_KEY), len(messages)) - len(messages)
+    elif settings.device_routing == "Least Loaded":
+        loads = get_device_loads()
+
+    for message in messages:
+        candidates = get_candidate_devices(settings.devices, companies.get(message.name))
+        device = devices.get(conversation_devices.get(message.phone))
+        if device not in candidates:
+            if settings.device_routing == "Round Robin":
+                device = candidates[next_index % len(candidates)]
+                next_index += 1
+            elif settings.device_routing == "Least Loaded":
+                device = min(candidates, key=lambda d: loads[d.device_id] / d.rate_limit_per_minute)
+            else:
+                device = candidates[zlib.crc32(message.phone.encode()) % len(candidates)]
+        if settings.device_routing == "Least Loaded":
+            loads[device.device_id] += 1
+        message.device = device
+
+    record_device_loads(Counter(message.device.device_id for message in messages))
+
+
+def get_candidate_devices(devices, company):
+    """
+    Devices that may send a message of `company`: the company's own devices if it has any,
+    otherwise the devices without a company (or all devices if every one has a company).
+    """
+    if company:
+        own = [device for device in devices if device.company == company]
+        if own:
+            return own
+    shared = [device for device in devices if not device.company]
+    return shared or list(devices)
+
+
+def get_message_companies(messages, settings):
+    """
+    {message name: company} from the documents the messages reference, one query per DocType.
+    References to DocTypes that no longer exist are treated as having no company.
+    """
+    names_by_doctype = {}
+    for message in messages:
+        if message.get("reference_doctype") and message.get("reference_name"):
+            names_by_doctype.setdefault(message.reference_doctype, set()).add(message.reference_name)
+
+    document_companies = {}
+    for doctype, names in names_by_doctype.items():
+        if not frappe.db.exists("DocType", doctype) or not frappe.get_meta(doctype).has_field("company"):
+            continue
+        for name, company in frappe.get_all(
+            doctype, filters={"name": ["in", list(names)]}, fields=["name", "company"], as_list=True
+        ):
+            document_companies[(doctype, name)] = company
+
+    return {
+        message.name: document_companies.get((message.get("reference_doctype"), message.get("reference_name")))
+        or settings.default_company
+        for message in messages
+    }
+
+
+def get_device_load_key():
+    return frappe.cache().make_key(f"{DEVICE_LOAD_PREFIX}:{int(time.time() // 60)}")
+
+
+def get_device_loads():
+    """
+    Messages routed to each device in the current minute, across all workers.
+    """
+    # Read through a raw pipeline: the cache wrapper's hgetall expects pickled values
+    pipeline = frappe.cache().pipeline()
+    pipeline.hgetall(get_device_load_key())
+    loads = Counter()
+    for device_id, count in pipeline.execute()[0].items():
+        loads[frappe.safe_decode(device_id)] = int(count)
+    return loads
+
+
+def record_device_loads(counts):
+    key = get_device_load_key()
+    pipeline = frappe.cache().pipeline()
+    for device_id, count in counts.items():
+        pipeline.hincrby(key, device_id, count)
+    pipeline.expire(key, DEVICE_LOAD_TTL_SECONDS)
+    pipeline.execute()
@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+
+import frappe
+from frappe.utils import cint, flt
+
+from wassenger_integration.client import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_READ_TIMEOUT,
+    WASSENGER_API_URL,
+)
+from wassenger_integration.metrics import timed
+
+SETTINGS_CACHE_KEY = "wassenger_settings_snapshot"
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_FILE_CACHE_TTL_DAYS = 30
+DEFAULT_RATE_PER_MINUTE = 60
+DEFAULT_BURST = 10
+DEFAULT_MAX_SEND_ATTEMPTS = 5
+DEFAULT_RETRY_BACKOFF_SECONDS = 60
+DEFAULT_DEDUP_WINDOW_HOURS = 24
+DEFAULT_DEVICE_ROUTING = "Sticky per Recipient"
+DEFAULT_FILE_UPLOAD_MODE = "URL"
+
+@dataclass(frozen=True)
+class WassengerDevice:
+    """
+    An enabled row of the Devices table: a WhatsApp number outbound messages can be routed
+    through, with its own API key (defaults to the main one) and rate limit.
+    """
+
+    device_id: str
+    api_key: str
+    company: str | None
+    rate_limit_per_minute: int
+    rate_limit_burst: int
+
+
+@dataclass(frozen=True)
+class WassengerSettingsSnapshot:
+    """
+    Read-only view of Wassenger Settings (plus the default company) with defaults applied.
+    Built once, shared through Redis and rebuilt only after the settings change.
+    """
+
+    api_key: str
+    allow_send_pdf_attachment: bool
+    default_company: str | None
+    default_country_code: str | None
+    base_url: str
+    http_pool_size: int
+    connect_timeout: float
+    read_timeout: float
+    send_concurrency: int
+    file_cache_ttl_days: int
+    rate_limit_per_minute: int
+    rate_limit_burst: int
+    max_send_attempts: int
+    retry_backoff_seconds: int
+    archive_after_days: int = 0
+    dedup_window_hours: int = DEFAULT_DEDUP_WINDOW_HOURS
+    file_upload_mode: str = DEFAULT_FILE_UPLOAD_MODE
+    coalesce_window_minutes: int = 0
+    merge_digest_pdfs: bool = False
+    devices: tuple = ()
+    device_routing: str = DEFAULT_DEVICE_ROUTING
+
+
+def build_settings_snapshot():
+    settings = frappe.get_single("Wassenger Settings")
+    rate_limit_per_minute = cint(settings.rate_limit_per_minute) or DEFAULT_RATE_PER_MINUTE
+    rate_limit_burst = cint(settings.rate_limit_burst) or DEFAULT_BURST
+    return WassengerSettingsSnapshot(
+        api_key=settings.api_key,
+        allow_send_pdf_attachment=bool(settings.allow_send_pdf_attachment),
+        default_company=frappe.db.get_single_value("Global Defaults", "default_company"),
+        default_country_code=(settings.default_country_code or "").strip() or None,
+        # Lets a site point the app at a stub server (tests, benchmarks) via site_config.json
+        base_url=frappe.conf.get("wassenger_api_url") or WASSENGER_API_URL,
+        http_pool_size=cint(settings.http_pool_size) or DEFAULT_POOL_SIZE,
+        connect_timeout=flt(settings.connect_timeout) or DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=flt(settings.read_timeout) or DEFAULT_READ_TIMEOUT,
+        send_concurrency=cint(settings.send_concurrency) or DEFAULT_CONCURRENCY,
+        file_cache_ttl_days=cint(settings.file_cache_ttl_days) or DEFAULT_FILE_CACHE_TTL_DAYS,
+        rate_limit_per_minute=rate_limit_per_minute,
+        rate_limit_burst=rate_limit_burst,
+        max_send_attempts=cint(settings.max_send_attempts) or DEFAULT_MAX_SEND_ATTEMPTS,
+        retry_backoff_seconds=cint(settings.retry_backoff_seconds) or DEFAULT_RETRY_BACKOFF_SECONDS,
+        archive_after_days=cint(settings.archive_after_days),
+        dedup_window_hours=cint(settings.dedup_window_hours) or DEFAULT_DEDUP_WINDOW_HOURS,
+        file_upload_mode=settings.file_upload_mode or DEFAULT_FILE_UPLOAD_MODE,
+        coalesce_window_minutes=cint(settings.coalesce_window_minutes),
+        merge_digest_pdfs=bool(settings.merge_digest_pdfs),
+        devices=tuple(
+            WassengerDevice(
+                device_id=row.device_id.strip(),
+                api_key=row.api_key or settings.api_key,
+                company=row.company or None,
+                rate_limit_per_minute=cint(row.rate_limit_per_minute) or rate_limit_per_minute,
+                rate_limit_burst=cint(row.rate_limit_burst) or rate_limit_burst,
+            )
+            for row in settings.devices
+            if row.enabled and (row.device_id or "").strip()
+        ),
+        device_routing=settings.device_routing or DEFAULT_DEVICE_ROUTING,
+    )
+
+
+def get_settings():
+    """
+    Return the settings snapshot without touching the database on the hot path:
+    memoized on frappe.local for the current request/job, shared across workers in Redis.
+    """
+    snapshot = getattr(frappe.local, "wassenger_settings", None)
+    if snapshot:
+        return snapshot
+
+    with timed("settings_load"):
+        snapshot = frappe.cache().get_value(SETTINGS_CACHE_KEY)
+        if not snapshot:
+            snapshot = build_settings_snapshot()
+            frappe.cache().set_value(SETTINGS_CACHE_KEY, snapshot)
+
+    frappe.local.wassenger_settings = snapshot
+    return snapshot
+
+
+def clear_settings_cache(*args, **kwargs):
+    """
+    Drop the snapshot; called when Wassenger Settings or Global Defaults are saved.
+    """
+    frappe.cache().delete_value(SETTINGS_CACHE_KEY)
+    frappe.local.wassenger_settings = None
@@ -0,0 +1,46 @@
+# Copyright (c) 2025, Ahmed Emam and Contributors
+# See license.txt
+
+from collections import Counter
+
+from frappe.tests.utils import FrappeTestCase
+
+from wassenger_integration.metrics import (
+	BUCKETS_MS,
+	get_bucket,
+	get_percentile,
+	get_stage_histograms,
+	record_samples,
+)
+
+
+class TestMetrics(FrappeTestCase):
+	def test_bucket_boundaries(self):
+		self.assertEqual(get_bucket(0), "5")
+		self.assertEqual(get_bucket(5), "5")
+		self.assertEqual(get_bucket(5.01), "10")
+		self.assertEqual(get_bucket(BUCKETS_MS[-1]), str(BUCKETS_MS[-1]))
+		self.assertEqual(get_bucket(BUCKETS_MS[-1] + 1), "inf")
+
+	def test_percentile_interpolates_inside_the_bucket(self):
+		histogram = Counter({"count": 10, "5": 5, "10": 5})
+		self.assertEqual(get_percentile(histogram, 50), 5.0)
+		self.assertEqual(get_percentile(histogram, 90), 9.0)
+		self.assertEqual(get_percentile(histogram, 100), 10.0)
+
+	def test_overflow_samples_count_as_the_last_bound(self):
+		histogram = Counter({"count": 10, "5": 5, "inf": 5})
+		self.assertEqual(get_percentile(histogram, 50), 5.0)
+		self.assertEqual(get_percentile(histogram, 90), float(BUCKETS_MS[-1]))
+
+	def test_empty_histogram_has_no_percentile(self):
+		self.assertIsNone(get_percentile(Counter(), 50))
+
+	def test_samples_are_recorded_into_their_buckets(self):
+		before = get_stage_histograms(1)["webhook_apply"]
+		record_samples([("webhook_apply", 0.004), ("webhook_apply", 0.2), ("webhook_apply", 60)])
+		after = get_stage_histograms(1)["webhook_apply"]
+
+		recorded = {field: after[field] - before[field] for field in ("count", "5", "250", "inf")}
+		self.assertEqual(recorded, {"count": 3, "5": 1, "250": 1, "inf": 1})
+		self.assertAlmostEqual(after["sum"] - before["sum"], 60204, places=3)
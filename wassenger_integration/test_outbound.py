@@ -0,0 +1,50 @@
+# Copyright (c) 2025, Ahmed Emam and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from wassenger_integration.outbound import insert_outbound_messages
+from wassenger_integration.settings import get_settings
+from wassenger_integration.wassenger_integration.doctype.wh_massage.test_wh_massage import TEST_PHONE
+
+
+class TestOutbound(FrappeTestCase):
+	def test_bulk_insert_rejects_invalid_messages(self):
+		names, errors = insert_outbound_messages(
+			[{"phone": "bad", "message": "x"}, {"phone": TEST_PHONE}, {"phone": TEST_PHONE, "message": "Hi"}],
+			get_settings(),
+		)
+		self.assertEqual([error["index"] for error in errors], [0, 1])
+		self.assertIsNone(names[0])
+		self.assertEqual(frappe.db.get_value("WH Massage", names[2], ["status", "docstatus"]), ("Pending", 1))
+
+	def test_bulk_insert_rejects_files_the_caller_cannot_read(self):
+		file = frappe.get_doc({
+			"doctype": "File",
+			"file_name": f"enqueue-{frappe.generate_hash(length=8)}.pdf",
+			"is_private": 1,
+			"content": b"%PDF-1.4 private attachment",
+		}).insert(ignore_permissions=True)
+		messages = [{"phone": TEST_PHONE, "file": file.file_url}]
+
+		names, errors = insert_outbound_messages(messages, get_settings(), caller="Guest")
+		self.assertEqual(names, [None])
+		self.assertEqual(errors[0]["error"], "File not found or not permitted.")
+
+		names, errors = insert_outbound_messages(messages, get_settings(), caller="Administrator")
+		self.assertEqual(errors, [])
+
+	def test_bulk_insert_rejects_links_to_missing_documents(self):
+		names, errors = insert_outbound_messages(
+			[
+				{"phone": TEST_PHONE, "message": "x", "reference_doctype": "No Such DocType", "reference_name": "x"},
+				{"phone": TEST_PHONE, "message": "x", "reference_doctype": "User", "reference_name": "no-such-user"},
+				{"phone": TEST_PHONE, "message": "x", "campaign": "no-such-campaign"},
+				{"phone": TEST_PHONE, "message": "x", "reference_doctype": "User", "reference_name": "Administrator"},
+			],
+			get_settings(),
+		)
+		self.assertEqual([error["index"] for error in errors], [0, 1, 2])
+		self.assertEqual(errors[0]["error"], "Reference Doctype No Such DocType not found.")
+		self.assertTrue(names[3])
@@ -0,0 +1,83 @@
+# Copyright (c) 2025, Ahmed Emam and Contributors
+# See license.txt
+
+import dataclasses
+import zlib
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from wassenger_integration.routing import assign_devices, get_device_load_key, get_message_companies
+from wassenger_integration.settings import WassengerDevice, get_settings
+
+
+def make_device(device_id, company=None, rate_limit_per_minute=60):
+	return WassengerDevice(
+		device_id=device_id,
+		api_key="test",
+		company=company,
+		rate_limit_per_minute=rate_limit_per_minute,
+		rate_limit_burst=10,
+	)
+
+
+def make_messages(*phones, **kwargs):
+	return [
+		frappe._dict(name=f"test-routing-{index}", phone=phone, **kwargs)
+		for index, phone in enumerate(phones)
+	]
+
+
+class TestRouting(FrappeTestCase):
+	def setUp(self):
+		frappe.cache().delete_value(get_device_load_key(), make_keys=False)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def route(self, messages, routing, devices, **settings):
+		settings = dataclasses.replace(
+			get_settings(), devices=tuple(devices), device_routing=routing, **{"default_company": None, **settings}
+		)
+		assign_devices(messages, settings)
+		return [message.device.device_id for message in messages]
+
+	def test_sticky_routing_keeps_a_recipient_on_one_device(self):
+		devices = [make_device("a"), make_device("b")]
+		phone = "+14155550142"
+		expected = devices[zlib.crc32(phone.encode()) % 2].device_id
+
+		self.assertEqual(self.route(make_messages(phone, phone), "Sticky per Recipient", devices), [expected] * 2)
+		self.assertEqual(self.route(make_messages(phone), "Sticky per Recipient", devices), [expected])
+
+	def test_round_robin_rotates_through_the_devices(self):
+		devices = [make_device("a"), make_device("b"), make_device("c")]
+		routed = self.route(make_messages("+14155550101", "+14155550102", "+14155550103"), "Round Robin", devices)
+		self.assertEqual(sorted(routed), ["a", "b", "c"])
+
+	def test_least_loaded_weighs_each_device_by_its_rate_limit(self):
+		devices = [make_device("slow", rate_limit_per_minute=60), make_device("fast", rate_limit_per_minute=120)]
+		routed = self.route(make_messages("+14155550101", "+14155550102", "+14155550103"), "Least Loaded", devices)
+		self.assertEqual(routed, ["slow", "fast", "fast"])
+
+	def test_conversation_stays_on_its_device(self):
+		phone = "+14155550199"
+		frappe.get_doc({"doctype": "WhatsApp Conversation", "phone": phone, "device": "b"}).insert(
+			ignore_permissions=True
+		)
+		devices = [make_device("a"), make_device("b")]
+		self.assertEqual(self.route(make_messages(phone), "Round Robin", devices), ["b"])
+
+	def test_company_devices_only_carry_their_company(self):
+		devices = [make_device("shared"), make_device("company", company="Test Routing Company")]
+		messages = make_messages("+14155550101", "+14155550102")
+		self.assertEqual(self.route(messages, "Round Robin", devices), ["shared", "shared"])
+		self.assertEqual(
+			self.route(messages, "Round Robin", devices, default_company="Test Routing Company"),
+			["company", "company"],
+		)
+
+	def test_references_to_missing_doctypes_have_no_company(self):
+		messages = make_messages("+14155550101", reference_doctype="No Such DocType", reference_name="x")
+		settings = dataclasses.replace(get_settings(), default_company=None)
+		self.assertEqual(get_message_companies(messages, settings), {messages[0].name: None})
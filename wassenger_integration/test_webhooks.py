@@ -0,0 +1,60 @@
+# Copyright (c) 2025, Ahmed Emam and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from wassenger_integration.wassenger_integration.doctype.wh_massage.test_wh_massage import make_message
+from wassenger_integration.webhooks import (
+	WEBHOOK_BUFFER_KEY,
+	WEBHOOK_HELD_KEY,
+	apply_status_events,
+	apply_webhook_events,
+	pop_webhook_events,
+	requeue_webhook_events,
+)
+
+
+class TestWebhooks(FrappeTestCase):
+	def setUp(self):
+		frappe.cache().delete_value([WEBHOOK_BUFFER_KEY, WEBHOOK_HELD_KEY])
+
+	def tearDown(self):
+		frappe.cache().delete_value([WEBHOOK_BUFFER_KEY, WEBHOOK_HELD_KEY])
+
+	def test_status_never_moves_backwards(self):
+		doc = make_message()
+		doc.db_set({"status": "Sent", "wassenger_message_id": "test-status-order"})
+		apply_status_events([{"message_id": "test-status-order", "status": "Read"}])
+		apply_status_events([{"message_id": "test-status-order", "status": "delivered"}])
+		self.assertEqual(frappe.db.get_value("WH Massage", doc.name, "status"), "Read")
+
+	def test_failed_apply_requeues_events(self):
+		events = [
+			{"kind": "status", "message_id": f"test-requeue-{index}", "status": "Delivered"}
+			for index in range(3)
+		]
+		requeue_webhook_events(events)
+
+		with patch("wassenger_integration.webhooks.apply_status_events", side_effect=Exception("boom")):
+			apply_webhook_events()
+
+		# Back at the front of the buffer, in their original order
+		self.assertEqual(pop_webhook_events(10), events)
+
+	def test_ack_before_the_message_is_saved_is_applied_later(self):
+		message_id = f"test-early-ack-{frappe.generate_hash(length=8)}"
+		requeue_webhook_events([{"kind": "status", "message_id": message_id, "status": "Delivered"}])
+		apply_webhook_events()
+
+		# The send batch commits the Wassenger message ID after the ack arrived
+		message = make_message()
+		message.db_set({"status": "Sent", "wassenger_message_id": message_id})
+		try:
+			apply_webhook_events()
+			self.assertEqual(frappe.db.get_value("WH Massage", message.name, "status"), "Delivered")
+		finally:
+			frappe.db.delete("WH Massage", message.name)
+			frappe.db.commit()
@@ -0,0 +1,90 @@
+# Copyright (c) 2025, Ahmed Emam and Contributors
+# See license.txt
+
+import dataclasses
+import hashlib
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from wassenger_integration.api import deliver_message, prepare_messages, save_delivery_results
+from wassenger_integration.benchmarks.stub_server import StubServer
+from wassenger_integration.file_cache import (
+	FILE_CACHE_PREFIX,
+	cache_file_ids,
+	get_cached_file_ids,
+	get_file_cache_keys,
+)
+from wassenger_integration.settings import get_settings
+from wassenger_integration.wassenger_integration.doctype.wh_massage.test_wh_massage import (
+	make_message,
+	make_pdf_file,
+)
+
+
+def cache_file_id(file_id="test-file-id"):
+	key = frappe.generate_hash(length=20)
+	cache_file_ids({key: {"file_id": file_id, "file_url": "/files/test.pdf", "content_hash": None}}, ttl_days=1)
+	return key
+
+
+class TestWassengerFileCache(FrappeTestCase):
+	def tearDown(self):
+		frappe.local.wassenger_settings = None
+		frappe.db.rollback()
+
+	def test_stored_files_are_keyed_by_content(self):
+		file = make_pdf_file(is_private=0)
+		keys = get_file_cache_keys([file.file_url, "https://example.com/invoice.pdf"])
+
+		self.assertEqual(
+			keys[file.file_url],
+			(hashlib.sha1(f"content:{file.content_hash}".encode()).hexdigest(), file.content_hash),
+		)
+		self.assertEqual(
+			keys["https://example.com/invoice.pdf"],
+			(hashlib.sha1(b"url:https://example.com/invoice.pdf").hexdigest(), None),
+		)
+
+	def test_redis_misses_fall_back_to_the_table(self):
+		key = cache_file_id()
+		frappe.cache().delete_value(f"{FILE_CACHE_PREFIX}:{key}")
+
+		self.assertEqual(get_cached_file_ids([key]), {key: "test-file-id"})
+		# Written back to Redis for the next lookup
+		self.assertEqual(frappe.cache().get_value(f"{FILE_CACHE_PREFIX}:{key}"), "test-file-id")
+
+	def test_expired_entries_are_not_used(self):
+		key = cache_file_id()
+		frappe.cache().delete_value(f"{FILE_CACHE_PREFIX}:{key}")
+		frappe.db.set_value("Wassenger File Cache", key, "expires_on", frappe.utils.add_to_date(None, days=-1))
+
+		self.assertEqual(get_cached_file_ids([key]), {})
+
+	def test_rejected_cached_file_is_uploaded_again(self):
+		doc = make_message(file=make_pdf_file(is_private=0).file_url)
+
+		with StubServer(known_files_only=True) as server:
+			settings = frappe.local.wassenger_settings = dataclasses.replace(
+				get_settings(),
+				api_key="test",
+				base_url=server.base_url,
+				allow_send_pdf_attachment=True,
+				file_upload_mode="URL",
+				devices=(),
+			)
+			message = prepare_messages([doc], settings)[0]
+			cache_file_ids(
+				{message.file_cache_key: {"file_id": "expired-file-id", "file_url": doc.file}},
+				ttl_days=1,
+			)
+			message = prepare_messages([doc], settings)[0]
+			self.assertEqual(message.file_id, "expired-file-id")
+
+			result = deliver_message(message, settings)
+			save_delivery_results([result], settings)
+
+		self.assertEqual((result.status, result.with_file), ("Sent", True))
+		self.assertEqual(server.counts["files"], 1)
+		new_file_id = server.messages[0]["media"]["file"]
+		self.assertEqual(get_cached_file_ids([message.file_cache_key]), {message.file_cache_key: new_file_id})
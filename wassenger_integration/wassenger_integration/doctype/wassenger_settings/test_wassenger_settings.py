@@ -1,9 +1,46 @@
 # Copyright (c) 2025, Ahmed Emam and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from wassenger_integration.settings import DEFAULT_RATE_PER_MINUTE, clear_settings_cache, get_settings
+
 
 class TestWassengerSettings(FrappeTestCase):
-	pass
+	def tearDown(self):
+		frappe.db.rollback()
+		frappe.clear_cache(doctype="Wassenger Settings")
+		clear_settings_cache()
+
+	def save_settings(self, **values):
+		settings = frappe.get_single("Wassenger Settings")
+		settings.api_key = settings.api_key or "test"
+		settings.update(values)
+		settings.save(ignore_permissions=True)
+		return settings
+
+	def test_snapshot_is_rebuilt_after_save(self):
+		self.save_settings(send_concurrency=3)
+		self.assertEqual(get_settings().send_concurrency, 3)
+
+		self.save_settings(send_concurrency=5)
+		self.assertEqual(get_settings().send_concurrency, 5)
+
+	def test_defaults_are_applied(self):
+		self.save_settings(rate_limit_per_minute=0)
+		self.assertEqual(get_settings().rate_limit_per_minute, DEFAULT_RATE_PER_MINUTE)
+
+	def test_only_enabled_devices_are_routed(self):
+		self.save_settings(
+			rate_limit_per_minute=30,
+			devices=[
+				{"device_id": "device-a", "enabled": 1},
+				{"device_id": "device-b", "enabled": 0},
+				{"device_id": "device-c", "enabled": 1, "api_key": "other", "rate_limit_per_minute": 90},
+			],
+		)
+		devices = get_settings().devices
+		self.assertEqual([device.device_id for device in devices], ["device-a", "device-c"])
+		self.assertEqual(devices[0].api_key, get_settings().api_key)
+		self.assertEqual((devices[0].rate_limit_per_minute, devices[1].rate_limit_per_minute), (30, 90))
@@ -4,6 +4,9 @@
 # import frappe
 from frappe.model.document import Document
 
+from wassenger_integration.settings import clear_settings_cache
+
 
 class WassengerSettings(Document):
-	pass
+	def on_update(self):
+		clear_settings_cache()
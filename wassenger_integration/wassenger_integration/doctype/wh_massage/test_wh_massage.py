@@ -1,9 +1,214 @@
 # Copyright (c) 2025, Ahmed Emam and Contributors
 # See license.txt
 
-# import frappe
+import dataclasses
+from io import BytesIO
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from wassenger_integration.api import deliver_message, prepare_messages, save_delivery_results
+from wassenger_integration.benchmarks.stub_server import StubServer
+from wassenger_integration.dedup import claim_messages
+from wassenger_integration.digests import coalesce_pending_messages
+from wassenger_integration.settings import get_settings
+
+TEST_PHONE = "+14155552671"
+
+
+def make_pdf_file(is_private=1):
+	from pypdf import PdfWriter
+
+	writer = PdfWriter()
+	writer.add_blank_page(width=72, height=72)
+	content = BytesIO()
+	writer.write(content)
+	return frappe.get_doc({
+		"doctype": "File",
+		"file_name": f"test-{frappe.generate_hash(length=8)}.pdf",
+		"is_private": is_private,
+		"content": content.getvalue(),
+	}).insert(ignore_permissions=True)
+
+
+def make_message(**kwargs):
+	return frappe.get_doc({
+		"doctype": "WH Massage",
+		"type": "out",
+		"phone": TEST_PHONE,
+		"send_message": "Test message",
+		"docstatus": 1,
+		**kwargs,
+	}).insert(ignore_permissions=True)
+
 
 class TestWHMassage(FrappeTestCase):
-	pass
+	def tearDown(self):
+		frappe.local.wassenger_settings = None
+		frappe.db.rollback()
+
+	def use_stub(self, server, **settings):
+		frappe.local.wassenger_settings = dataclasses.replace(
+			get_settings(),
+			api_key="test",
+			base_url=server.base_url,
+			allow_send_pdf_attachment=False,
+			devices=(),
+			**settings,
+		)
+		return frappe.local.wassenger_settings
+
+	def send(self, doc, settings=None, **stub_options):
+		with StubServer(**stub_options) as server:
+			settings = self.use_stub(server, **(settings or {}))
+			result = deliver_message(prepare_messages([doc], settings)[0], settings)
+			save_delivery_results([result], settings)
+		doc.reload()
+		return server
+
+	def test_invalid_phone_is_failed(self):
+		doc = make_message(phone="12345")
+		self.assertEqual(doc.status, "Failed")
+
+	def test_phone_is_normalized(self):
+		doc = make_message(phone="+1 (415) 555-2671")
+		self.assertEqual(doc.phone, TEST_PHONE)
+		self.assertEqual(doc.status, "Pending")
+
+	def test_send(self):
+		doc = make_message()
+		server = self.send(doc)
+		self.assertEqual(doc.status, "Sent")
+		self.assertEqual(doc.wassenger_message_id, server.messages[0]["id"])
+		self.assertEqual(server.messages[0]["phone"], TEST_PHONE)
+		self.assertEqual(doc.conversation, TEST_PHONE)
+
+	def test_direct_upload_streams_the_file(self):
+		content = b"%PDF-1.4 test attachment"
+		file = frappe.get_doc({
+			"doctype": "File",
+			"file_name": f"direct-upload-{frappe.generate_hash(length=8)}.pdf",
+			"is_private": 1,
+			"content": content,
+		}).insert(ignore_permissions=True)
+		doc = make_message(file=file.file_url)
+
+		server = self.send(doc, settings={"allow_send_pdf_attachment": True, "file_upload_mode": "Direct Upload"})
+		self.assertEqual(doc.status, "Sent")
+		self.assertTrue(server.uploads[0]["content_type"].startswith("multipart/form-data"))
+		self.assertGreater(server.uploads[0]["size"], len(content))
+		self.assertIn("media", server.messages[0])
+
+	def test_direct_upload_skips_private_files_the_owner_cannot_read(self):
+		file = frappe.get_doc({
+			"doctype": "File",
+			"file_name": f"direct-upload-{frappe.generate_hash(length=8)}.pdf",
+			"is_private": 1,
+			"content": b"%PDF-1.4 private attachment",
+		}).insert(ignore_permissions=True)
+		doc = make_message(file=file.file_url)
+		doc.db_set("owner", "Guest")
+		doc.reload()
+
+		server = self.send(doc, settings={"allow_send_pdf_attachment": True, "file_upload_mode": "Direct Upload"})
+		self.assertEqual(doc.status, "Sent")
+		self.assertEqual(server.uploads, [])
+		self.assertNotIn("media", server.messages[0])
+
+	def test_rate_limited_message_stays_pending(self):
+		doc = make_message()
+		self.send(doc, rate_limit_rate=1)
+		self.assertEqual(doc.status, "Pending")
+		self.assertEqual(doc.attempts, 0)
+		self.assertTrue(doc.next_attempt_at)
+
+	def test_server_error_is_retried(self):
+		doc = make_message()
+		self.send(doc, error_rate=1)
+		self.assertEqual(doc.status, "Retrying")
+		self.assertEqual(doc.attempts, 1)
+		self.assertTrue(doc.last_error)
+
+	def test_dead_letter_after_last_attempt(self):
+		doc = make_message()
+		doc.db_set("attempts", get_settings().max_send_attempts - 1)
+		self.send(doc, error_rate=1)
+		self.assertEqual(doc.status, "Dead Letter")
+
+	def test_burst_is_coalesced_into_a_digest(self):
+		first = make_message(send_message="Invoice 1 is due")
+		second = make_message(send_message="Invoice 2 is due")
+		for doc in (first, second):
+			doc.db_set("next_attempt_at", frappe.utils.add_to_date(None, minutes=-1))
+
+		coalesce_pending_messages(dataclasses.replace(get_settings(), coalesce_window_minutes=5))
+		first.reload()
+		second.reload()
+		self.assertEqual((first.status, second.status), ("Coalesced", "Coalesced"))
+		self.assertEqual(first.digest, second.digest)
+
+		digest = frappe.get_doc("WH Massage", first.digest)
+		self.assertTrue(digest.is_digest)
+		self.assertEqual(digest.status, "Pending")
+		self.assertIn("Invoice 1 is due", digest.send_message)
+		self.assertLess(digest.send_message.index("Invoice 1"), digest.send_message.index("Invoice 2"))
+
+	def coalesce_pdfs(self, owner):
+		docs = [make_message(send_message=f"Invoice {index} is due", file=make_pdf_file().file_url) for index in range(2)]
+		for doc in docs:
+			doc.db_set({"owner": owner, "next_attempt_at": frappe.utils.add_to_date(None, minutes=-1)})
+
+		coalesce_pending_messages(dataclasses.replace(
+			get_settings(), coalesce_window_minutes=5, merge_digest_pdfs=True, file_upload_mode="URL"
+		))
+		for doc in docs:
+			doc.reload()
+		return docs
+
+	def test_merged_digest_pdf_stays_private(self):
+		first, _ = self.coalesce_pdfs("Administrator")
+		self.assertEqual(first.status, "Coalesced")
+
+		digest = frappe.get_doc("WH Massage", first.digest)
+		self.assertEqual(digest.owner, "Administrator")
+		self.assertTrue(digest.file.startswith("/private/files/whatsapp-digest-"))
+
+	def test_pdfs_the_owner_cannot_read_are_not_coalesced(self):
+		docs = self.coalesce_pdfs("Guest")
+		self.assertEqual([doc.status for doc in docs], ["Pending", "Pending"])
+		self.assertEqual([doc.digest for doc in docs], [None, None])
+
+	def test_identical_message_is_sent_once(self):
+		text = f"Invoice reminder {frappe.generate_hash(length=8)}"
+		first = make_message(send_message=text)
+		amended = make_message(send_message=text)
+		self.assertEqual(first.dedup_key, amended.dedup_key)
+
+		with StubServer() as server:
+			settings = self.use_stub(server)
+			messages, skipped = claim_messages(prepare_messages([first, amended], settings), settings)
+			# The second copy waits while the first is being sent...
+			self.assertEqual([message.name for message in messages], [first.name])
+			self.assertIn("next_attempt_at", skipped[amended.name])
+			save_delivery_results([deliver_message(messages[0], settings)], settings)
+
+			# ...and is not sent once the first one was
+			messages, skipped = claim_messages(prepare_messages([amended], settings), settings)
+			self.assertEqual(messages, [])
+			self.assertEqual(skipped[amended.name]["status"], "Duplicate")
+		self.assertEqual(server.counts["messages"], 1)
+
+	def test_identical_message_is_sent_again_after_the_window(self):
+		text = f"Monthly reminder {frappe.generate_hash(length=8)}"
+		first = make_message(send_message=text)
+		first.db_set({
+			"status": "Sent",
+			"wassenger_message_id": f"test-{first.name}",
+			"creation": frappe.utils.add_to_date(None, hours=-25),
+		})
+		later = make_message(send_message=text)
+
+		settings = dataclasses.replace(get_settings(), dedup_window_hours=24)
+		messages, skipped = claim_messages(prepare_messages([later], settings), settings)
+		self.assertEqual([message.name for message in messages], [later.name])
+		self.assertEqual(skipped, {})
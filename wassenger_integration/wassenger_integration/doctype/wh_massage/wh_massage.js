@@ -9,14 +9,42 @@
 
 frappe.ui.form.on('WH Massage', {
     refresh: function(frm) {
-        // Show button only if status is empty (None)
-        if (!frm.doc.status) {
-            frm.add_custom_button(__('Send WhatsApp Message'), function() {
+        // Show button only while the message has not been sent (status empty or still queued)
+        if (!frm.doc.wassenger_message_id && (!frm.doc.status || (frm.doc.docstatus === 1 && frm.doc.status === 'Pending'))) {
+            let send_button = frm.add_custom_button(__('Send WhatsApp Message'), function() {
+                // Ignore repeated clicks until the first one is answered; the server
+                // also refuses to send the same message twice (see dedup.py)
+                if (frm.__sending_whatsapp) {
+                    return;
+                }
+                frm.__sending_whatsapp = true;
                 frappe.call({
                     method: 'wassenger_integration.api.send_whatsapp_message',
                     args: {
                         docname: frm.doc.name
                     },
+                    btn: send_button,
+                    freeze: true,
+                    callback: function(r) {
+                        if (!r.exc) {
+                            frm.reload_doc();
+                        }
+                    },
+                    always: function() {
+                        frm.__sending_whatsapp = false;
+                    }
+                });
+            });
+        }
+
+        // Failed sends can be put back in the outbound queue
+        if (frm.doc.docstatus === 1 && ['Failed', 'Dead Letter', 'Retrying'].includes(frm.doc.status)) {
+            frm.add_custom_button(__('Retry Sending'), function() {
+                frappe.call({
+                    method: 'wassenger_integration.api.retry_message',
+                    args: {
+                        docname: frm.doc.name
+                    },
                     freeze: true,
                     callback: function(r) {
                         if (!r.exc) {
@@ -1,42 +1,74 @@
 import frappe
 from frappe.model.document import Document
 
+from wassenger_integration.dedup import get_dedup_key
+from wassenger_integration.phone import normalize_phone
+from wassenger_integration.settings import get_settings
+
+
+def is_valid_whatsapp_number(number):
+    """
+    Check if the phone number is in the correct WhatsApp format:
+    - Starts with '+'
+    - Only digits after '+'
+    - At least 10 digits after '+'
+    """
+    if not number or not isinstance(number, str):
+        return False
+    if not number.startswith('+'):
+        return False
+    digits = number[1:]
+    if not digits.isdigit():
+        return False
+    if len(digits) < 10:
+        return False
+    return True
+
+
 class WHMassage(Document):
-    def after_insert(self):
+    def before_insert(self):
+        """
+        Default the type to 'out' (inbound replies are stored by the webhook consumer).
         """
-        After inserting a WH Massage document:
-        - Set the type to 'out'.
-        - Validate the phone number for WhatsApp delivery:
-          - Must be a non-empty string.
-          - Must start with '+' (country code required, e.g. +14155552671).
-          - Only digits allowed after '+'.
-          - Minimum 10 digits after '+'.
-        - If the phone number is missing or invalid, set status to 'Failed' and add a comment explaining why.
-        - If the phone number is valid, set status to 'Pending'.
+        if not self.type:
+            self.type = "out"
+
+    def validate(self):
+        """
+        Validate the phone number of an outbound message on the in-memory doc, so creating
+        (and submitting) a message is a single insert:
+        - The number is normalized to international format first (see `phone.normalize_phone`).
+        - Must start with '+' (country code required, e.g. +14155552671), digits only,
+          at least 10 digits.
+        - If the phone number is missing or invalid, set status to 'Failed'; a comment
+          explaining why is added after insert.
+        - If the phone number is valid, set status to 'Pending', held for the coalescing
+          window if one is set in Wassenger Settings.
+        - The dedup key (see `dedup.get_dedup_key`) is set from the final phone and text, so
+          an amended copy of a sent message is recognized as a duplicate and not sent again.
         """
-        frappe.db.set_value(self.doctype, self.name, "type", "out")
-        phone = getattr(self, "phone", None)
+        if self.type != "out":
+            return
+
+        if self.is_new() or self.has_value_changed("phone"):
+            settings = get_settings()
+            self.phone = normalize_phone(self.phone, settings.default_country_code) or self.phone
+            if is_valid_whatsapp_number(self.phone):
+                self.status = "Pending"
+                if self.is_new() and not self.is_digest:
+                    # Give later messages for the same phone a chance to join a digest
+                    from wassenger_integration.outbound import get_coalescing_hold
+                    self.next_attempt_at = get_coalescing_hold(settings)
+            else:
+                self.status = "Failed"
+                self.flags.invalid_phone = True
 
-        def is_valid_whatsapp_number(number):
-            """
-            Check if the phone number is in the correct WhatsApp format:
-            - Starts with '+'
-            - Only digits after '+'
-            - At least 10 digits after '+'
-            """
-            if not number or not isinstance(number, str):
-                return False
-            if not number.startswith('+'):
-                return False
-            digits = number[1:]
-            if not digits.isdigit():
-                return False
-            if len(digits) < 10:
-                return False
-            return True
+        self.dedup_key = get_dedup_key(
+            self.reference_doctype, self.reference_name, self.phone, self.send_message
+        )
 
-        if not is_valid_whatsapp_number(phone):
-            frappe.db.set_value(self.doctype, self.name, "status", "Failed")
+    def after_insert(self):
+        if self.flags.invalid_phone:
             self.add_comment(
                 "Comment",
                 text=(
@@ -44,27 +76,21 @@ class WHMassage(Document):
                     "or does not include country code (e.g. +14155552671)."
                 )
             )
-        else:
-            frappe.db.set_value(self.doctype, self.name, "status", "Pending")
-            self.reload()
 
     def on_submit(self):
         """
         On submit of WH Massage:
-        - If status is NOT "Failed", send WhatsApp message.
+        - If status is NOT "Failed", hand the message to the outbound queue.
         - If status is "Failed", do nothing.
-        - If sending fails, set status to 'Failed' and add a comment.
+        - Sending happens in a background worker after this transaction commits,
+          so the submitting request never waits on Wassenger.
         """
-        # Reload status from DB to ensure we have the latest value
-        status = frappe.db.get_value(self.doctype, self.name, "status")
-        if status != "Failed":
-            try:
-                from wassenger_integration.api import send_whatsapp_message
-                send_whatsapp_message(self.name)
-            except Exception as e:
-                self.db_set("status", "Failed")
-                frappe.log_error(f"Error sending WhatsApp for WH Massage {self.name}: {str(e)}")
-                self.add_comment(
-                    "Comment",
-                    text=f"WhatsApp sending failed due to system error. See error log. ({str(e)})"
-                )
\ No newline at end of file
+        if self.status != "Failed":
+            from wassenger_integration.outbound import enqueue_outbound_queue
+            enqueue_outbound_queue()
+
+
+def on_doctype_update():
+    # Conversation timelines and per-number history are read newest-first
+    frappe.db.add_index("WH Massage", ["conversation", "creation"])
+    frappe.db.add_index("WH Massage", ["phone", "creation"])
@@ -0,0 +1,33 @@
+# Copyright (c) 2025, Ahmed Emam and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from wassenger_integration.archive import ARCHIVED_FIELDS, archive_chunk
+
+
+class TestWHMassageArchive(FrappeTestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_archive_chunk_moves_messages(self):
+		doc = frappe.get_doc({
+			"doctype": "WH Massage",
+			"type": "out",
+			"phone": "+14155552671",
+			"send_message": "Archived message",
+			"docstatus": 1,
+		}).insert(ignore_permissions=True)
+		doc.db_set({"status": "Read", "wassenger_message_id": "test-archive"})
+
+		rows = frappe.get_all("WH Massage", filters={"name": doc.name}, fields=["name", "creation", *ARCHIVED_FIELDS])
+		archive_chunk(rows)
+
+		self.assertFalse(frappe.db.exists("WH Massage", doc.name))
+		archived = frappe.get_doc("WH Massage Archive", doc.name)
+		self.assertEqual(
+			(archived.status, archived.wassenger_message_id, archived.send_message),
+			("Read", "test-archive", "Archived message"),
+		)
+		self.assertEqual(archived.message_creation, doc.creation)
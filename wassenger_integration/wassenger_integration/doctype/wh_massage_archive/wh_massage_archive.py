@@ -0,0 +1,14 @@
+# Copyright (c) 2025, Ahmed Emam and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class WHMassageArchive(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("WH Massage Archive", ["phone", "message_creation"])
+	frappe.db.add_index("WH Massage Archive", ["reference_doctype", "reference_name"])
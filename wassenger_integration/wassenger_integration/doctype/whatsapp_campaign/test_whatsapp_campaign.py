@@ -0,0 +1,153 @@
+# Copyright (c) 2025, Ahmed Emam and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, today
+
+from wassenger_integration import campaigns
+from wassenger_integration.campaigns import INVOICE_FIELDS, get_invoice_filters, run_campaign
+
+TEST_PHONE = "+14155552671"
+CHUNK_SIZE = 2
+ENQUEUE_CAMPAIGN = "wassenger_integration.wassenger_integration.doctype.whatsapp_campaign.whatsapp_campaign.enqueue_campaign"
+
+
+class FakeInvoices:
+	"""
+	Overdue Sales Invoices served to `run_campaign` without ERPNext, honouring its keyset
+	pagination (`name > cursor`, ordered by name, `limit`), plus a record of what was queued.
+	"""
+
+	def __init__(self, count):
+		self.invoices = [
+			frappe._dict(
+				name=f"TEST-SINV-{index:04d}",
+				customer=f"Test Customer {index % 3}",
+				customer_name=None,
+				company="Test Company",
+				currency="USD",
+				due_date=add_days(today(), -10),
+				outstanding_amount=100,
+				contact_mobile=None,
+			)
+			for index in range(count)
+		]
+		self.queued = []
+		self.on_insert = None
+		self.get_all = frappe.get_all
+
+	def get_invoices(self, doctype, *args, filters=None, limit=None, **kwargs):
+		if doctype != "Sales Invoice":
+			return self.get_all(doctype, *args, filters=filters, limit=limit, **kwargs)
+		cursor = next((value for field, _, value in filters if field == "name"), "")
+		return [frappe._dict(invoice) for invoice in self.invoices if invoice.name > cursor][:limit]
+
+	def insert(self, messages, settings):
+		if self.on_insert:
+			self.on_insert()
+		self.queued.extend(message["reference_name"] for message in messages)
+		return [frappe.generate_hash(length=10) for _ in messages], []
+
+	def run(self, campaign):
+		with (
+			patch.object(frappe, "get_all", self.get_invoices),
+			patch.object(frappe.db, "count", lambda doctype, filters=None: len(self.invoices)),
+			patch.object(campaigns, "CHUNK_SIZE", CHUNK_SIZE),
+			patch.object(campaigns, "get_invoice_columns", lambda fields: list(INVOICE_FIELDS)),
+			patch.object(campaigns, "insert_outbound_messages", self.insert),
+			patch.object(campaigns, "enqueue_outbound_queue"),
+			patch.object(campaigns, "resolve_party_phones", self.resolve_party_phones),
+		):
+			run_campaign(campaign.name)
+		campaign.reload()
+
+	def resolve_party_phones(self, party_type, parties):
+		# "Test Customer 2" has no WhatsApp number, on the customer or the invoice
+		return {party: TEST_PHONE for party in parties if party != "Test Customer 2"}
+
+
+def make_campaign(**kwargs):
+	return frappe.get_doc({
+		"doctype": "WhatsApp Campaign",
+		"campaign_name": f"Test Campaign {frappe.generate_hash(length=8)}",
+		"status": "Queued",
+		**kwargs,
+	}).insert(ignore_permissions=True)
+
+
+class TestWhatsAppCampaign(FrappeTestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+		frappe.db.delete("WhatsApp Campaign", {"campaign_name": ["like", "Test Campaign %"]})
+		frappe.db.commit()
+
+	def test_selection_filters(self):
+		campaign = frappe._dict(
+			min_outstanding_amount=50, min_days_overdue=7, max_days_overdue=30, company="Test Company"
+		)
+		self.assertEqual(get_invoice_filters(campaign), [
+			["docstatus", "=", 1],
+			["is_return", "=", 0],
+			["outstanding_amount", ">", 50],
+			["due_date", "<=", add_days(today(), -7)],
+			["due_date", ">=", add_days(today(), -30)],
+			["company", "=", "Test Company"],
+		])
+		self.assertEqual(len(get_invoice_filters(frappe._dict(min_days_overdue=1))), 4)
+
+	def test_invoices_are_queued_once_chunk_by_chunk(self):
+		invoices = FakeInvoices(5)
+		campaign = make_campaign()
+		invoices.run(campaign)
+
+		self.assertEqual(campaign.status, "Completed")
+		self.assertEqual(campaign.cursor, "TEST-SINV-0004")
+		self.assertEqual(
+			(campaign.total_recipients, campaign.processed_count, campaign.queued_count, campaign.skipped_count),
+			(5, 5, 4, 1),
+		)
+		self.assertEqual(invoices.queued, ["TEST-SINV-0000", "TEST-SINV-0001", "TEST-SINV-0003", "TEST-SINV-0004"])
+
+	def test_failed_campaign_resumes_after_the_last_queued_chunk(self):
+		invoices = FakeInvoices(5)
+		campaign = make_campaign()
+		chunks = iter([None, Exception("worker died")])
+
+		def fail_on_second_chunk():
+			error = next(chunks, None)
+			if error:
+				raise error
+
+		invoices.on_insert = fail_on_second_chunk
+		invoices.run(campaign)
+		self.assertEqual(campaign.status, "Failed")
+		self.assertEqual(campaign.cursor, f"TEST-SINV-{CHUNK_SIZE - 1:04d}")
+		self.assertEqual(campaign.processed_count, CHUNK_SIZE)
+
+		with patch(ENQUEUE_CAMPAIGN):
+			campaign.start()
+		invoices.run(campaign)
+		self.assertEqual(campaign.status, "Completed")
+		self.assertEqual(campaign.processed_count, 5)
+		# Nothing from the first chunk is queued twice
+		self.assertEqual(len(invoices.queued), len(set(invoices.queued)))
+
+	def test_paused_campaign_stops_after_the_chunk_and_resumes(self):
+		invoices = FakeInvoices(5)
+		campaign = make_campaign()
+		invoices.on_insert = lambda: frappe.db.set_value("WhatsApp Campaign", campaign.name, "status", "Paused")
+		invoices.run(campaign)
+		self.assertEqual(campaign.status, "Paused")
+		self.assertEqual(campaign.processed_count, CHUNK_SIZE)
+
+		invoices.on_insert = None
+		with patch(ENQUEUE_CAMPAIGN):
+			campaign.start()
+		self.assertEqual(campaign.status, "Queued")
+		invoices.run(campaign)
+		self.assertEqual(campaign.status, "Completed")
+		self.assertEqual(campaign.processed_count, 5)
+		self.assertEqual(campaign.cursor, "TEST-SINV-0004")
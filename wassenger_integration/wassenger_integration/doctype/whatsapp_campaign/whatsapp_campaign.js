@@ -0,0 +1,27 @@
+// Copyright (c) 2025, Ahmed Emam and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('WhatsApp Campaign', {
+    refresh: function(frm) {
+        if (frm.is_new()) {
+            return;
+        }
+
+        if (['Draft', 'Paused', 'Failed', 'Completed'].includes(frm.doc.status)) {
+            let label = frm.doc.status === 'Draft' ? __('Start') : (frm.doc.status === 'Completed' ? __('Run Again') : __('Resume'));
+            frm.add_custom_button(label, function() {
+                frm.call('start', { restart: frm.doc.status === 'Completed' }).then(() => frm.reload_doc());
+            });
+        }
+
+        if (['Scheduled', 'Queued', 'Running'].includes(frm.doc.status)) {
+            frm.add_custom_button(__('Pause'), function() {
+                frm.call('pause').then(() => frm.reload_doc());
+            });
+        }
+
+        frm.add_custom_button(__('View Messages'), function() {
+            frappe.set_route('List', 'WH Massage', { campaign: frm.doc.name });
+        });
+    }
+});
@@ -0,0 +1,59 @@
+# Copyright (c) 2025, Ahmed Emam and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, get_datetime, now_datetime
+
+from wassenger_integration.campaigns import enqueue_campaign
+from wassenger_integration.message_templates import compile_template
+
+
+class WhatsAppCampaign(Document):
+	def validate(self):
+		if self.message_template:
+			try:
+				compile_template(self.message_template)
+			except Exception as e:
+				frappe.throw(frappe._("Invalid template: {0}").format(e))
+
+		if cint(self.max_days_overdue) and cint(self.max_days_overdue) < cint(self.min_days_overdue):
+			frappe.throw(frappe._("Max Days Overdue cannot be less than Min Days Overdue."))
+
+	@frappe.whitelist()
+	def start(self, restart=False):
+		"""
+		Start, resume (from the saved cursor) or, with `restart`, re-run the campaign from scratch.
+		"""
+		self.check_permission("write")
+		if self.status in ("Scheduled", "Queued", "Running"):
+			frappe.throw(frappe._("The campaign is already {0}.").format(self.status))
+
+		values = {}
+		if cint(restart) or self.status == "Completed":
+			values.update({
+				"cursor": None,
+				"total_recipients": 0,
+				"processed_count": 0,
+				"queued_count": 0,
+				"skipped_count": 0,
+				"progress": 0,
+				"started_at": None,
+				"completed_at": None,
+			})
+
+		if self.scheduled_at and get_datetime(self.scheduled_at) > now_datetime():
+			values["status"] = "Scheduled"
+		else:
+			values["status"] = "Queued"
+			enqueue_campaign(self.name)
+		self.db_set(values)
+
+	@frappe.whitelist()
+	def pause(self):
+		"""
+		Stop the campaign after the chunk being processed; `start` resumes it.
+		"""
+		self.check_permission("write")
+		if self.status in ("Scheduled", "Queued", "Running"):
+			self.db_set("status", "Paused")
@@ -0,0 +1,52 @@
+# Copyright (c) 2025, Ahmed Emam and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from wassenger_integration.conversations import upsert_conversations
+
+TEST_PHONE = "+14155550177"
+CONVERSATION_FIELDS = ["last_message", "last_direction", "unread_count", "contact_name", "party", "device"]
+
+
+def make_entry(direction, message, timestamp, **kwargs):
+	return {"phone": TEST_PHONE, "direction": direction, "message": message, "timestamp": timestamp, **kwargs}
+
+
+class TestWhatsAppConversation(FrappeTestCase):
+	def setUp(self):
+		frappe.db.delete("WhatsApp Conversation", TEST_PHONE)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_conversation(self):
+		return frappe.db.get_value("WhatsApp Conversation", TEST_PHONE, CONVERSATION_FIELDS, as_dict=True)
+
+	def test_inbound_messages_create_the_conversation(self):
+		upsert_conversations([
+			make_entry("in", "Second", "2025-01-01 10:05:00", contact_name="Ann"),
+			make_entry("in", "First", "2025-01-01 10:00:00"),
+		])
+		conversation = self.get_conversation()
+		# The latest message wins whatever order the batch arrives in
+		self.assertEqual((conversation.last_message, conversation.last_direction), ("Second", "in"))
+		self.assertEqual(conversation.unread_count, 2)
+		self.assertEqual(conversation.contact_name, "Ann")
+
+	def test_outbound_message_updates_the_existing_conversation(self):
+		upsert_conversations([make_entry("in", "Hello", "2025-01-01 10:00:00", party_type="Customer", party="Ann")])
+		upsert_conversations([
+			make_entry("out", "Your invoice", "2025-01-01 10:10:00", party_type="Customer", party="Bob", device="a"),
+		])
+		conversation = self.get_conversation()
+		self.assertEqual((conversation.last_message, conversation.last_direction), ("Your invoice", "out"))
+		# Sending does not mark anything as read, nor move the conversation to another party
+		self.assertEqual(conversation.unread_count, 1)
+		self.assertEqual(conversation.party, "Ann")
+		self.assertEqual(conversation.device, "a")
+
+	def test_preview_is_truncated(self):
+		upsert_conversations([make_entry("out", "x" * 500, "2025-01-01 10:00:00")])
+		self.assertEqual(len(self.get_conversation().last_message), 140)
@@ -0,0 +1,19 @@
+// Copyright (c) 2025, Ahmed Emam and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('WhatsApp Conversation', {
+    refresh: function(frm) {
+        frm.add_custom_button(__('View Messages'), function() {
+            frappe.set_route('List', 'WH Massage', { conversation: frm.doc.name });
+        });
+        frm.add_custom_button(__('View Archived Messages'), function() {
+            frappe.set_route('List', 'WH Massage Archive', { conversation: frm.doc.name });
+        });
+
+        if (frm.doc.unread_count) {
+            frm.add_custom_button(__('Mark as Read'), function() {
+                frm.call('mark_as_read').then(() => frm.reload_doc());
+            });
+        }
+    }
+});
@@ -0,0 +1,11 @@
+# Copyright (c) 2025, Ahmed Emam and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class WhatsAppConversation(Document):
+	@frappe.whitelist()
+	def mark_as_read(self):
+		self.db_set("unread_count", 0)
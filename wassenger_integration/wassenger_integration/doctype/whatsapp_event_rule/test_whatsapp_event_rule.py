@@ -0,0 +1,84 @@
+# Copyright (c) 2025, Ahmed Emam and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from wassenger_integration.event_rules import EventRule, handle_doc_event
+from wassenger_integration.patches.v1_0 import migrate_send_on_submit_settings
+from wassenger_integration.patches.v1_0.migrate_send_on_submit_settings import SEND_ON_SUBMIT_RULES
+
+TEST_PHONE = "+14155552671"
+
+
+class TestWhatsAppEventRule(FrappeTestCase):
+	def tearDown(self):
+		frappe.local.wassenger_event_rules = None
+
+	def test_rules_on_own_doctypes_are_rejected(self):
+		rule = frappe.get_doc({"doctype": "WhatsApp Event Rule", "document_type": "WH Massage", "event": "Save"})
+		self.assertRaises(frappe.ValidationError, rule.insert)
+
+	def test_matching_rule_queues_a_message(self):
+		frappe.local.wassenger_event_rules = {
+			("User", "on_update"): (EventRule(
+				name="test-rule",
+				version="1",
+				document_type="User",
+				event="on_update",
+				party_type=None,
+				party_type_field=None,
+				party_field=None,
+				phone_source="Document Field",
+				phone_field="mobile_no",
+				template="Hello {{ first_name }}, {{ name }} was updated.",
+				condition="doc.first_name == 'Rule'",
+				attach_pdf=False,
+			),),
+		}
+		doc = frappe._dict(doctype="User", name="Administrator", first_name="Other", mobile_no=TEST_PHONE)
+		filters = {"reference_doctype": "User", "reference_name": "Administrator", "phone": TEST_PHONE}
+		before = frappe.db.count("WH Massage", filters)
+
+		handle_doc_event(doc, "on_update")
+		self.assertEqual(frappe.db.count("WH Massage", filters), before)
+
+		doc.first_name = "Rule"
+		handle_doc_event(doc, "on_submit")
+		self.assertEqual(frappe.db.count("WH Massage", filters), before)
+
+		handle_doc_event(doc, "on_update")
+		message = frappe.get_last_doc("WH Massage", filters)
+		self.assertEqual(message.send_message, "Hello Rule, Administrator was updated.")
+		self.assertEqual(message.status, "Pending")
+
+	def test_send_on_submit_settings_become_rules(self):
+		doctypes = [rule["document_type"] for rule in SEND_ON_SUBMIT_RULES.values()]
+		if not all(frappe.db.exists("DocType", doctype) for doctype in doctypes):
+			self.skipTest("ERPNext is not installed")
+
+		frappe.db.delete("WhatsApp Event Rule", {"document_type": ["in", doctypes]})
+		for field in SEND_ON_SUBMIT_RULES:
+			frappe.db.sql(
+				"insert into `tabSingles` (doctype, field, value) values ('Wassenger Settings', %s, '1')", field
+			)
+
+		# Validated against the real DocType meta on insert
+		migrate_send_on_submit_settings.execute()
+
+		rules = {
+			rule.document_type: rule
+			for rule in frappe.get_all(
+				"WhatsApp Event Rule",
+				filters={"document_type": ["in", doctypes], "event": "Submit"},
+				fields=["document_type", "party_field", "phone_source", "phone_field"],
+			)
+		}
+		self.assertEqual(set(rules), set(doctypes))
+		# Party numbers only, as the old hook sent them
+		self.assertEqual({rule.phone_source for rule in rules.values()}, {"Party"})
+		self.assertFalse(any(rule.phone_field for rule in rules.values()))
+		self.assertFalse(frappe.db.sql(
+			"select field from `tabSingles` where doctype = 'Wassenger Settings' and field in %(fields)s",
+			{"fields": list(SEND_ON_SUBMIT_RULES)},
+		))
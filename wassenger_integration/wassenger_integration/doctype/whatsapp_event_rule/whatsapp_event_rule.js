@@ -0,0 +1,17 @@
+// Copyright (c) 2025, Ahmed Emam and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('WhatsApp Event Rule', {
+    setup: function(frm) {
+        // Messages about the app's own documents would trigger more messages
+        frm.set_query('document_type', function() {
+            return {
+                filters: {
+                    istable: 0,
+                    issingle: 0,
+                    module: ['!=', 'Wassenger Integration']
+                }
+            };
+        });
+    }
+});
@@ -0,0 +1,49 @@
+# Copyright (c) 2025, Ahmed Emam and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+from wassenger_integration.event_rules import (
+	PHONE_FROM_FIELD,
+	PHONE_FROM_PARTY,
+	clear_event_rules_cache,
+)
+from wassenger_integration.message_templates import compile_template
+
+
+class WhatsAppEventRule(Document):
+	def validate(self):
+		meta = frappe.get_meta(self.document_type)
+		if meta.module == "Wassenger Integration":
+			frappe.throw(frappe._("WhatsApp messages cannot be sent on events of {0}.").format(self.document_type))
+		if self.event in ("Submit", "Cancel") and not meta.is_submittable:
+			frappe.throw(frappe._("{0} is not submittable.").format(self.document_type))
+
+		for fieldname in (self.party_type_field, self.party_field, self.phone_field):
+			if fieldname and not meta.has_field(fieldname):
+				frappe.throw(frappe._("{0} has no field {1}.").format(self.document_type, fieldname))
+
+		if self.party_type and self.party_type_field:
+			frappe.throw(frappe._("Set either Party Type or Party Type Field, not both."))
+		if self.phone_source != PHONE_FROM_FIELD and not (self.party_field and (self.party_type or self.party_type_field)):
+			frappe.throw(frappe._("Set the party of the document to read its phone number."))
+		if self.phone_source != PHONE_FROM_PARTY and not self.phone_field:
+			frappe.throw(frappe._("Set the Phone Field to read the phone number from."))
+
+		if self.condition:
+			try:
+				compile(self.condition, "<condition>", "eval")
+			except SyntaxError as e:
+				frappe.throw(frappe._("Invalid condition: {0}").format(e))
+		if self.template:
+			try:
+				compile_template(self.template)
+			except Exception as e:
+				frappe.throw(frappe._("Invalid template: {0}").format(e))
+
+	def on_update(self):
+		clear_event_rules_cache()
+
+	def on_trash(self):
+		clear_event_rules_cache()
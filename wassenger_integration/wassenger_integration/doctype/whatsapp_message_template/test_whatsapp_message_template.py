@@ -0,0 +1,63 @@
+# Copyright (c) 2025, Ahmed Emam and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from wassenger_integration.message_templates import (
+	clear_template_cache,
+	compile_template,
+	render_message,
+	render_template,
+)
+
+
+class TestWhatsAppMessageTemplate(FrappeTestCase):
+	def setUp(self):
+		frappe.db.delete("WhatsApp Message Template", {"document_type": "User"})
+		clear_template_cache("User")
+
+	def tearDown(self):
+		frappe.db.rollback()
+		clear_template_cache("User")
+
+	def test_only_document_fields_are_projected(self):
+		_, fields = compile_template(
+			"Dear {{ customer_name }}, {{ doctype }} {{ name }} of {{ company }}\n"
+			"{{ line('Due Date', formatdate(due_date)) }}"
+		)
+		self.assertEqual(fields, ["customer_name", "due_date"])
+
+	def test_render_from_the_field_projection(self):
+		template, fields = compile_template(
+			"Dear {{ customer_name }},\n{{ line('Contact', contact_person) }}\n{{ doctype }} *{{ name }}* is ready."
+		)
+		values = {"name": "SINV-0001", "customer_name": "Ann", "company": "Test Company", "grand_total": 100}
+		# The missing field renders nothing and its line is dropped
+		self.assertEqual(
+			render_template(template, fields, values, "Sales Invoice"),
+			"Dear Ann,\nSales Invoice *SINV-0001* is ready.",
+		)
+
+	def test_saved_template_replaces_the_default(self):
+		template = frappe.get_doc({
+			"doctype": "WhatsApp Message Template",
+			"document_type": "User",
+			"template": "Hello {{ first_name }}",
+		}).insert(ignore_permissions=True)
+		self.assertEqual(render_message("User", {"name": "test@example.com", "first_name": "Ann"}), "Hello Ann")
+
+		template.template = "Hi {{ first_name }}, {{ name }} was updated"
+		template.save(ignore_permissions=True)
+		self.assertEqual(
+			render_message("User", {"name": "test@example.com", "first_name": "Ann"}),
+			"Hi Ann, test@example.com was updated",
+		)
+
+	def test_invalid_template_is_rejected(self):
+		template = frappe.get_doc({
+			"doctype": "WhatsApp Message Template",
+			"document_type": "User",
+			"template": "Hello {{ first_name ",
+		})
+		self.assertRaises(frappe.ValidationError, template.insert, ignore_permissions=True)
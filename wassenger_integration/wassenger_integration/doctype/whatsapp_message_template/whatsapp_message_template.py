@@ -0,0 +1,21 @@
+# Copyright (c) 2025, Ahmed Emam and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+from wassenger_integration.message_templates import clear_template_cache, compile_template
+
+
+class WhatsAppMessageTemplate(Document):
+	def validate(self):
+		try:
+			compile_template(self.template)
+		except Exception as e:
+			frappe.throw(frappe._("Invalid template: {0}").format(e))
+
+	def on_update(self):
+		clear_template_cache(self.document_type)
+
+	def on_trash(self):
+		clear_template_cache(self.document_type)
@@ -0,0 +1,280 @@
+import datetime
+import json
+import time
+
+import frappe
+
+from wassenger_integration.conversations import upsert_conversations
+from wassenger_integration.metrics import timed
+from wassenger_integration.phone import normalize_phone
+from wassenger_integration.settings import get_settings
+
+WEBHOOK_BUFFER_KEY = "wassenger_webhook_events"
+WEBHOOK_SEEN_PREFIX = "wassenger_webhook_seen"
+WEBHOOK_SEEN_TTL = 24 * 60 * 60
+WEBHOOK_JOB_ID = "wassenger_apply_webhook_events"
+WEBHOOK_HELD_KEY = "wassenger_webhook_held_status_events"
+# How long a status event for a message ID we do not know yet is kept and retried: a send
+# batch only commits its message IDs once the whole (paced) batch was delivered
+HELD_STATUS_EVENT_TTL = 30 * 60
+BATCH_SIZE = 500
+MAX_BATCHES_PER_RUN = 20
+
+# Wassenger ack values mapped to the WH Massage status they stand for
+DELIVERY_STATUS_BY_ACK = {
+    "pending": "Queued",
+    "queued": "Queued",
+    "sent": "Sent",
+    "delivered": "Delivered",
+    "read": "Read",
+    "played": "Read",
+    "failed": "Failed",
+    "error": "Failed",
+}
+
+# A message only ever moves forward: queued < sent < failed < delivered < read.
+# Failed outranks sent (Wassenger gave up after accepting it) but a later delivered/read wins.
+# Our own queue statuses (Pending, Retrying, Dead Letter, ...) rank below all of them.
+DELIVERY_RANK = {
+    "Queued": 10,
+    "Sent": 20,
+    "Failed": 25,
+    "Delivered": 30,
+    "Read": 40,
+}
+
+
+def get_delivery_status(ack):
+    """
+    Normalize a Wassenger ack/status value ("delivered", "Read", ...) to a WH Massage status,
+    or None if it is not a delivery state we track.
+    """
+    return DELIVERY_STATUS_BY_ACK.get(str(ack or "").strip().lower())
+
+
+def buffer_webhook_event(kind, payload, dedupe_key=None):
+    """
+    Append a validated webhook event to the Redis buffer and make sure a consumer is queued.
+    This is all a webhook request does, so Wassenger gets its 200 without waiting on the database.
+    Events whose `dedupe_key` was already seen in the last day (webhook redeliveries) are dropped
+    here; returns False for those.
+    """
+    cache = frappe.cache()
+    if dedupe_key and not cache.set(
+        cache.make_key(f"{WEBHOOK_SEEN_PREFIX}:{dedupe_key}"), 1, nx=True, ex=WEBHOOK_SEEN_TTL
+    ):
+        return False
+
+    cache.rpush(WEBHOOK_BUFFER_KEY, json.dumps({"kind": kind, **payload}))
+    frappe.enqueue(
+        "wassenger_integration.webhooks.apply_webhook_events",
+        queue="short",
+        job_id=WEBHOOK_JOB_ID,
+        deduplicate=True,
+    )
+    return True
+
+
+def pop_webhook_events(limit):
+    """
+    Atomically take up to `limit` events off the front of the buffer.
+    """
+    cache = frappe.cache()
+    key = cache.make_key(WEBHOOK_BUFFER_KEY)
+    pipeline = cache.pipeline()
+    pipeline.lrange(key, 0, limit - 1)
+    pipeline.ltrim(key, limit, -1)
+    events, _ = pipeline.execute()
+    return [json.loads(event) for event in events]
+
+
+def requeue_webhook_events(events):
+    """
+    Put events back at the front of the buffer (in their original order) after a failed apply.
+    """
+    if not events:
+        return
+    cache = frappe.cache()
+    pipeline = cache.pipeline()
+    pipeline.lpush(cache.make_key(WEBHOOK_BUFFER_KEY), *[json.dumps(event) for event in reversed(events)])
+    pipeline.execute()
+
+
+def hold_status_events(events):
+    """
+    Keep status events for messages not saved yet, to be retried by the next run
+    (see `apply_webhook_events`); events held longer than `HELD_STATUS_EVENT_TTL` are dropped.
+    """
+    now = time.time()
+    events = [
+        {**event, "held_since": event.get("held_since") or now}
+        for event in events
+        if now - (event.get("held_since") or now) < HELD_STATUS_EVENT_TTL
+    ]
+    if not events:
+        return
+
+    cache = frappe.cache()
+    key = cache.make_key(WEBHOOK_HELD_KEY)
+    pipeline = cache.pipeline()
+    pipeline.rpush(key, *[json.dumps(event) for event in events])
+    pipeline.expire(key, HELD_STATUS_EVENT_TTL)
+    pipeline.execute()
+
+
+def pop_held_status_events():
+    """
+    Atomically take every held status event.
+    """
+    cache = frappe.cache()
+    key = cache.make_key(WEBHOOK_HELD_KEY)
+    pipeline = cache.pipeline()
+    pipeline.lrange(key, 0, -1)
+    pipeline.delete(key)
+    events, _ = pipeline.execute()
+    return [json.loads(event) for event in events]
+
+
+def apply_webhook_events(batch_size=BATCH_SIZE, max_batches=MAX_BATCHES_PER_RUN):
+    """
+    Drain the webhook buffer in batches, with one commit per batch.
+    Runs right after webhooks arrive and from the scheduler as a safety net.
+    Status events held by earlier runs, because their message was not saved yet, are
+    retried with the first batch.
+    """
+    events = pop_held_status_events()
+    for _ in range(max_batches):
+        events += pop_webhook_events(batch_size)
+        if not events:
+            break
+        try:
+            with timed("webhook_apply"):
+                unmatched = apply_status_events([event for event in events if event["kind"] == "status"])
+                insert_inbound_messages([event for event in events if event["kind"] == "reply"])
+                frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error("Error applying Wassenger webhook events")
+            requeue_webhook_events(events)
+            break
+        hold_status_events(unmatched)
+        events = []
+
+
+def apply_status_events(events):
+    """
+    Apply status events through the delivery state machine:
+    - per message, only the most advanced status in the batch is kept;
+    - one indexed UPDATE per resulting status, which skips rows already at that status
+      or further along, so stale and duplicate events never touch the row.
+    Returns the events whose message ID matches no WH Massage yet: acks can arrive before
+    the send batch that got the ID from Wassenger has committed it.
+    """
+    target_status = {}
+    for event in events:
+        status = get_delivery_status(event["status"])
+        if not status:
+            continue
+        current = target_status.get(event["message_id"])
+        if not current or DELIVERY_RANK[status] > DELIVERY_RANK[current]:
+            target_status[event["message_id"]] = status
+
+    if not target_status:
+        return []
+
+    known_ids = set(frappe.get_all(
+        "WH Massage",
+        filters={"wassenger_message_id": ["in", list(target_status)]},
+        pluck="wassenger_message_id",
+    ))
+    unmatched = [
+        event for event in events
+        if event["message_id"] in target_status and event["message_id"] not in known_ids
+    ]
+
+    message_ids_by_status = {}
+    for message_id, status in target_status.items():
+        if message_id not in known_ids:
+            continue
+        message_ids_by_status.setdefault(status, []).append(message_id)
+
+    modified = frappe.utils.now()
+    for status, message_ids in message_ids_by_status.items():
+        not_before = [other for other, rank in DELIVERY_RANK.items() if rank >= DELIVERY_RANK[status]]
+        frappe.db.sql(
+            """
+            update `tabWH Massage`
+            set status = %(status)s, modified = %(modified)s
+            where wassenger_message_id in %(message_ids)s
+                and coalesce(status, '') not in %(not_before)s
+            """,
+            {"status": status, "modified": modified, "message_ids": message_ids, "not_before": not_before},
+        )
+    return unmatched
+
+
+def insert_inbound_messages(events):
+    """
+    Store inbound replies as `type = "in"` WH Massage rows with a single multi-row INSERT,
+    threaded into their WhatsApp Conversation (created on the first message from a number).
+    Messages already stored (redeliveries) are skipped before touching conversations.
+    """
+    rows = {}
+    for event in events:
+        rows.setdefault(event["message_id"], event)
+    if not rows:
+        return
+
+    for message_id in frappe.get_all(
+        "WH Massage", filters={"wassenger_message_id": ["in", list(rows)]}, pluck="wassenger_message_id"
+    ):
+        rows.pop(message_id, None)
+    if not rows:
+        return
+
+    default_country_code = get_settings().default_country_code
+    now = frappe.utils.now()
+    values = []
+    conversation_entries = []
+    for message_id, event in rows.items():
+        phone = normalize_phone(event.get("phone"), default_country_code) or event.get("phone")
+        timestamp = get_message_datetime(event.get("timestamp")) or now
+        values.append((
+            frappe.generate_hash(length=10), now, now, "Guest", "Guest", 0,
+            message_id, "in", phone, event.get("body"), event.get("status"),
+            phone, event.get("chat_id"), event.get("contact_name"), event.get("to_number"), timestamp,
+        ))
+        conversation_entries.append({
+            "phone": phone,
+            "direction": "in",
+            "message": event.get("body"),
+            "timestamp": str(timestamp),
+            "chat_id": event.get("chat_id"),
+            "contact_name": event.get("contact_name"),
+        })
+
+    # Conversations first: the messages link to them
+    upsert_conversations(conversation_entries)
+    frappe.db.bulk_insert(
+        "WH Massage",
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by", "docstatus",
+            "wassenger_message_id", "type", "phone", "send_message", "status",
+            "conversation", "chat_id", "contact_name", "to_number", "message_timestamp",
+        ],
+        values=values,
+        ignore_duplicates=True,
+    )
+
+
+def get_message_datetime(timestamp):
+    """
+    Convert a Wassenger unix timestamp (seconds) to a system-timezone datetime string.
+    """
+    if not timestamp:
+        return None
+    try:
+        utc = datetime.datetime.fromtimestamp(float(timestamp), tz=datetime.timezone.utc).replace(tzinfo=None)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return str(frappe.utils.convert_utc_to_system_timezone(utc).replace(tzinfo=None))